@@ -0,0 +1,74 @@
+"""Benchmark of rolit.check_capture against its previous implementation
+
+Run from the root of the project: `python -m benchmarks.check_capture`
+"""
+
+import random
+from time import perf_counter
+from modules.rolit import *
+
+
+def check_capture_directions(grid: list[list[int]], x: int, y: int, color: int) -> list[tuple[int]]:
+    """Previous check_capture: filters the directions and walks each ray with bounds checks"""
+    captures = []
+    directions = ((-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1))
+    if x == 0: # remove directions that are out of bounds
+        directions = [d for d in directions if d[0] != -1]
+    if x == WIDTH - 1:
+        directions = [d for d in directions if d[0] != 1]
+    if y == 0:
+        directions = [d for d in directions if d[1] != -1]
+    if y == HEIGHT - 1:
+        directions = [d for d in directions if d[1] != 1]
+    for dx, dy in directions:
+        x_, y_ = x + dx, y + dy
+        capture = []
+        while (0 <= x_ < WIDTH) and (0 <= y_ < HEIGHT):
+            if grid[y_][x_] in (CLEAR, color):
+                break
+            capture.append((x_, y_))
+            x_, y_ = x_ + dx, y_ + dy
+        if (0 <= x_ < WIDTH) and (0 <= y_ < HEIGHT) and grid[y_][x_] == color:
+            captures.extend(capture)
+    return captures
+
+
+def positions(nb_rounds: int, seed: int = 0) -> list[tuple[list[list[int]], int, int, int]]:
+    """Record every candidate placement of random 4 player rounds
+
+    :param nb_rounds: the number of rounds
+    :param seed: the random seed
+    :return: the placements as (grid, x, y, color)"""
+    random.seed(seed)
+    out = []
+    for _ in range(nb_rounds):
+        grid = init_grid()
+        for tour in range(WIDTH * HEIGHT - 4):
+            color = TURNS[4][tour % 4]
+            snapshot = [row[:] for row in grid]
+            moves = sorted(legal_moves(grid))
+            out.extend((snapshot, x, y, color) for x, y in moves)
+            x, y = random.choice(moves)
+            play(grid, x, y, color)
+    return out
+
+
+def run(nb_rounds: int = 50) -> None:
+    """Time both implementations on the same placements and print the results
+
+    :param nb_rounds: the number of rounds to record placements from"""
+    cases = positions(nb_rounds)
+    for grid, x, y, color in cases:
+        assert check_capture(grid, x, y, color) == check_capture_directions(grid, x, y, color)
+    timings = {}
+    for name, function in (("directions", check_capture_directions), ("rays", check_capture)):
+        start = perf_counter()
+        for grid, x, y, color in cases:
+            function(grid, x, y, color)
+        timings[name] = perf_counter() - start
+        print(f"{name:>10} : {len(cases) / timings[name]:10.0f} appels/s")
+    print(f"gain : x{timings['directions'] / timings['rays']:.2f}")
+
+
+if __name__ == "__main__":
+    run()
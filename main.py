@@ -1,5 +1,5 @@
 # main file
-import argparse, modules.graphical as graphical, modules.cmd as cmd
+import argparse
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Jeu de Rolit")
@@ -11,17 +11,75 @@ if __name__ == "__main__":
     parser.add_argument("-m", "--nb_manches", help="Nombre de manches", default=0, type=int)
     # choose if the player wants to play against the AI
     parser.add_argument("--ai", help="Jouer contre l'IA", default=False, type=bool, action=argparse.BooleanOptionalAction)
+    # delay before each AI move in the graphical mode
+    parser.add_argument("--delai_ia", help="Délai avant chaque coup des IA en mode graphique, en secondes", default=1.0, type=float)
+    commands = parser.add_subparsers(dest="command")
+    # headless self-play between AIs
+    simulate_parser = commands.add_parser("simulate", help="Faire jouer des IA entre elles sans affichage")
+    simulate_parser.add_argument("--games", help="Nombre de parties", default=100, type=int)
+    simulate_parser.add_argument("--players", help="Nombre de joueurs", default=4, type=int, choices=(2, 3, 4))
+    simulate_parser.add_argument("--rounds", help="Nombre de manches par partie", default=1, type=int)
+    simulate_parser.add_argument("--ai", dest="strategies", help="IA de chaque joueur, séparées par des virgules (greedy, random, alphabeta, maxn, mcts)", default="greedy")
+    simulate_parser.add_argument("--time", help="Temps de réflexion des IA de recherche par coup, en secondes", default=0.1, type=float)
+    simulate_parser.add_argument("--depth", help="Profondeur maximale de alphabeta et maxn", default=0, type=int)
+    simulate_parser.add_argument("--endgame", help="Résoudre exactement la fin des manches (par défaut seulement pour alphabeta, maxn et mcts)", default=None, action=argparse.BooleanOptionalAction)
+    simulate_parser.add_argument("--book", help="Livre d'ouvertures à utiliser (aucun par défaut)", default=None)
+    simulate_parser.add_argument("--table_bits", help="Taille des tables de transposition, en puissance de 2 (18 par défaut)", default=0, type=int)
+    simulate_parser.add_argument("--output", help="Fichier de résultats", default="simulation.jsonl")
+    simulate_parser.add_argument("--seed", help="Graine aléatoire", default=None, type=int)
+    simulate_parser.add_argument("--archive", help="Archive de parties à compléter (une partie par enregistrement binaire)", default=None)
+    # round-robin between AIs on several processes
+    tournament_parser = commands.add_parser("tournament", help="Tournoi entre IA sur plusieurs processus")
+    tournament_parser.add_argument("--ai", dest="strategies", help="IA participantes, séparées par des virgules", default="greedy,random")
+    tournament_parser.add_argument("--games", help="Nombre de parties par groupe d'IA et par placement", default=10, type=int)
+    tournament_parser.add_argument("--players", help="Nombre de joueurs par partie", default=2, type=int, choices=(2, 3, 4))
+    tournament_parser.add_argument("--rounds", help="Nombre de manches par partie", default=1, type=int)
+    tournament_parser.add_argument("--time", help="Temps de réflexion des IA de recherche par coup, en secondes", default=0.1, type=float)
+    tournament_parser.add_argument("--depth", help="Profondeur maximale de alphabeta et maxn", default=0, type=int)
+    tournament_parser.add_argument("--endgame", help="Résoudre exactement la fin des manches (par défaut seulement pour alphabeta, maxn et mcts)", default=None, action=argparse.BooleanOptionalAction)
+    tournament_parser.add_argument("--book", help="Livre d'ouvertures à utiliser (aucun par défaut)", default=None)
+    tournament_parser.add_argument("--workers", help="Nombre de processus (par défaut, un par cœur)", default=None, type=int)
+    tournament_parser.add_argument("--output", help="Fichier de résultats", default="tournament.jsonl")
+    tournament_parser.add_argument("--seed", help="Graine aléatoire", default=None, type=int)
+    # speedup of the multi-process searches
+    parallel_parser = commands.add_parser("parallel", help="Mesurer l'accélération des recherches multi-processus")
+    parallel_parser.add_argument("--workers", help="Nombre de processus (par défaut, un par cœur)", default=None, type=int)
+    parallel_parser.add_argument("--players", help="Nombre de joueurs", default=4, type=int, choices=(2, 3, 4))
+    parallel_parser.add_argument("--moves", help="Nombre de coups aléatoires joués avant la mesure", default=10, type=int)
+    parallel_parser.add_argument("--time", help="Temps de chaque recherche mcts, en secondes", default=2.0, type=float)
+    parallel_parser.add_argument("--depth", help="Profondeur des recherches alphabeta", default=5, type=int)
+    parallel_parser.add_argument("--seed", help="Graine aléatoire de la position", default=None, type=int)
+    # opening book learnt from an archive of self-play games
+    book_parser = commands.add_parser("book", help="Construire le livre d'ouvertures des IA à partir d'une archive de parties")
+    book_parser.add_argument("--archive", help="Archive de parties (voir simulate --archive)", required=True)
+    book_parser.add_argument("--output", help="Fichier du livre d'ouvertures", default="book.rlb")
+    book_parser.add_argument("--plies", help="Nombre de coups appris au début de chaque manche", default=12, type=int)
     args = parser.parse_args()
 
-    if args.nb_players < 2 and args.nb_players != 0:
-        print("Cannot have this little players, redirecting to choose prompt")
-        args.nb_players = 0
-    elif args.nb_players > 4:
-        print("Cannot have more than 4 players, truncating to 4.")
-        args.nb_players = 4
-
-    # enter correct game loop based on dislpay mode
-    if args.graphical:
-        graphical.mainloop(args.nb_players, args.nb_manches, args.ai)
+    if args.command == "simulate":
+        import modules.simulate as simulate
+        simulate.main(args)
+    elif args.command == "tournament":
+        import modules.tournament as tournament
+        tournament.main(args)
+    elif args.command == "parallel":
+        import modules.parallel as parallel
+        parallel.main(args)
+    elif args.command == "book":
+        import modules.book as book
+        book.main(args)
     else:
-        cmd.mainloop(args.nb_players, args.nb_manches, args.ai)
+        if args.nb_players < 2 and args.nb_players != 0:
+            print("Cannot have this little players, redirecting to choose prompt")
+            args.nb_players = 0
+        elif args.nb_players > 4:
+            print("Cannot have more than 4 players, truncating to 4.")
+            args.nb_players = 4
+
+        # enter correct game loop based on dislpay mode
+        if args.graphical:
+            import modules.graphical as graphical
+            graphical.mainloop(args.nb_players, args.nb_manches, args.ai, args.delai_ia)
+        else:
+            import modules.cmd as cmd
+            cmd.mainloop(args.nb_players, args.nb_manches, args.ai)
@@ -0,0 +1,405 @@
+"""Search based AIs for the Rolit game"""
+
+from random import shuffle
+from time import perf_counter
+from modules.rolit import *
+from modules.mcts import mcts_move
+
+DEFAULT_DEPTH = 4 # maximum depth of the iterative deepening
+DEFAULT_TIME_BUDGET = 1.0 # seconds allowed per move
+DEFAULT_TABLE_BITS = 18 # the transposition tables hold 2**18 entries
+ENDGAME_TIME_BUDGET = 2.0 # seconds allowed to the endgame solver before falling back to the normal search
+INFINITY = 1000
+EXACT, LOWER, UPPER = 0, 1, 2 # bound types of the transposition table entries
+
+
+class SearchTimeout(Exception):
+    """Raised inside the search when the time budget is exhausted"""
+
+
+class TranspositionTable:
+    """Bounded table of searched positions, indexed by Zobrist key.
+
+    Each slot holds one entry (key, depth, value, bound, move, generation).
+    A slot is replaced when the new entry was searched at least as deep, or
+    when the stored one comes from a previous search."""
+    __slots__ = ("slots", "mask", "generation", "probes", "hits", "stores")
+
+    def __init__(self, size_bits: int = DEFAULT_TABLE_BITS) -> None:
+        self.slots = [None] * (1 << size_bits)
+        self.mask = (1 << size_bits) - 1
+        self.generation = 0
+        self.probes = 0
+        self.hits = 0
+        self.stores = 0
+
+    def new_search(self) -> None:
+        """Mark the stored entries as coming from a previous search"""
+        self.generation += 1
+
+    def probe(self, key: int) -> tuple | None:
+        """Look for a position
+
+        :param key: the Zobrist key of the position
+        :return: the stored entry, or None if the position isn't stored"""
+        self.probes += 1
+        entry = self.slots[key & self.mask]
+        if entry is not None and entry[0] == key:
+            self.hits += 1
+            return entry
+        return None
+
+    def store(self, key: int, depth: int, value: int, bound: int, move: tuple[int, int] | None) -> None:
+        """Store a searched position
+
+        :param key: the Zobrist key of the position
+        :param depth: the depth it was searched to
+        :param value: its value
+        :param bound: EXACT, LOWER or UPPER
+        :param move: the best move found"""
+        index = key & self.mask
+        entry = self.slots[index]
+        if entry is None or entry[5] != self.generation or depth >= entry[1]:
+            self.slots[index] = (key, depth, value, bound, move, self.generation)
+            self.stores += 1
+
+    def hit_rate(self) -> float:
+        """Get the proportion of probes that found their position"""
+        return self.hits / self.probes if self.probes else 0.0
+
+    def usage(self) -> float:
+        """Get the proportion of slots in use"""
+        return sum(entry is not None for entry in self.slots) / len(self.slots)
+
+
+TABLES = {} # transposition tables reused between the moves of each AI, by (color, players)
+TABLE_BITS = DEFAULT_TABLE_BITS # size of the tables created by get_table, set by `simulate --table_bits`
+
+
+def get_table(color: int, players: tuple[int, ...]) -> TranspositionTable:
+    """Get the transposition table of an AI, creating it if needed
+
+    :param color: the color of the AI
+    :param players: the colors in playing order
+    :return: the transposition table"""
+    if (color, players) not in TABLES:
+        TABLES[(color, players)] = TranspositionTable(TABLE_BITS)
+    return TABLES[(color, players)]
+
+
+def table_stats() -> tuple[float, float]:
+    """Get the hit rate and the usage of all the transposition tables of this process, to size them
+
+    :return: the proportion of probes that found their position and the proportion of slots in use"""
+    probes = sum(table.probes for table in TABLES.values())
+    hits = sum(table.hits for table in TABLES.values())
+    usage = sum(table.usage() for table in TABLES.values()) / len(TABLES) if TABLES else 0.0
+    return hits / probes if probes else 0.0, usage
+
+
+# the 4 quadrants of the board, used for the parity move ordering of the endgame solver
+QUADRANTS = tuple(
+    sum(1 << (y * WIDTH + x) for y in range(top, top + HEIGHT // 2) for x in range(left, left + WIDTH // 2))
+    for top in (0, HEIGHT // 2) for left in (0, WIDTH // 2)
+)
+
+
+class Search:
+    """State shared by all the nodes of one search"""
+    __slots__ = ("color", "players", "deadline", "nodes", "table", "parity")
+
+    def __init__(self, color: int, players: tuple[int, ...], deadline: float, table: TranspositionTable | None = None, parity: bool = False) -> None:
+        self.color = color
+        self.players = players
+        self.deadline = deadline
+        self.nodes = 0
+        self.table = table
+        self.parity = parity # order the moves by quadrant parity, for the endgame solver
+
+    def tick(self) -> None:
+        """Count a node and stop the search if the deadline is passed"""
+        self.nodes += 1
+        # checking the clock is slow, so only do it every 256 nodes
+        if self.nodes & 0xFF == 0 and perf_counter() > self.deadline:
+            raise SearchTimeout
+
+
+def evaluate(board: BitBoard, color: int, players: tuple[int, ...]) -> int:
+    """Evaluate a position for color, against its best opponent
+
+    :param board: the game board
+    :param color: the color to evaluate for
+    :param players: the colors in the game
+    :return: the score difference with the best opponent"""
+    masks = board.masks
+    best_opponent = max((masks[player].bit_count() for player in players if player != color), default=0)
+    return masks[color].bit_count() - best_opponent
+
+
+def ordered_moves(board: BitBoard, color: int, first: tuple[int, int] | None = None, parity: bool = False) -> list[tuple[int, int]]:
+    """Get the legal moves sorted by capture count, most captures first
+
+    :param board: the game board
+    :param color: the color of the player
+    :param first: a move to try before the others (the best move of the previous iteration)
+    :param parity: between moves with as many captures, prefer the quadrants with an odd amount of empty cells
+    :return: the sorted moves"""
+    moves = mask_to_cells(board.frontier)
+    shuffle(moves) # random tie-breaking between moves with the same amount of captures
+    if parity:
+        empty = ~board.occupied()
+        odd = 0
+        for quadrant in QUADRANTS:
+            if (quadrant & empty).bit_count() % 2 == 1:
+                odd |= quadrant
+        moves.sort(key=lambda move: (board.capture_mask(move[0], move[1], color).bit_count(), odd >> (move[1] * WIDTH + move[0]) & 1), reverse=True)
+    else:
+        moves.sort(key=lambda move: board.capture_mask(move[0], move[1], color).bit_count(), reverse=True)
+    if first in moves:
+        moves.remove(first)
+        moves.insert(0, first)
+    return moves
+
+
+def alphabeta(board: BitBoard, depth: int, alpha: int, beta: int, color: int, search: Search) -> int:
+    """Paranoid alpha-beta: the searching player maximises, every opponent minimises
+
+    With 2 players this is plain alpha-beta.
+
+    :param board: the game board
+    :param depth: the remaining depth
+    :param alpha: the lower bound
+    :param beta: the upper bound
+    :param color: the color to move
+    :param search: the search state
+    :return: the value of the position for the searching player"""
+    search.tick()
+    if depth == 0 or not board.frontier:
+        return evaluate(board, search.color, search.players)
+    table = search.table
+    key = board.key ^ SIDE_KEYS[color]
+    best_move = None
+    if table is not None:
+        entry = table.probe(key)
+        if entry is not None:
+            _, entry_depth, entry_value, bound, best_move, _ = entry
+            if entry_depth >= depth:
+                if bound == EXACT:
+                    return entry_value
+                if bound == LOWER and entry_value >= beta:
+                    return entry_value
+                if bound == UPPER and entry_value <= alpha:
+                    return entry_value
+    original_alpha, original_beta = alpha, beta
+    following = next_player(search.players, color)
+    if color == search.color:
+        value = -INFINITY
+        for x, y in ordered_moves(board, color, best_move, search.parity):
+            undo = make_move(board, x, y, color)
+            child = alphabeta(board, depth - 1, alpha, beta, following, search)
+            unmake_move(board, x, y, undo)
+            if child > value:
+                value, best_move = child, (x, y)
+            alpha = max(alpha, value)
+            if alpha >= beta:
+                break
+    else:
+        value = INFINITY
+        for x, y in ordered_moves(board, color, best_move, search.parity):
+            undo = make_move(board, x, y, color)
+            child = alphabeta(board, depth - 1, alpha, beta, following, search)
+            unmake_move(board, x, y, undo)
+            if child < value:
+                value, best_move = child, (x, y)
+            beta = min(beta, value)
+            if alpha >= beta:
+                break
+    if table is not None:
+        if value <= original_alpha:
+            bound = UPPER
+        elif value >= original_beta:
+            bound = LOWER
+        else:
+            bound = EXACT
+        table.store(key, depth, value, bound, best_move)
+    return value
+
+
+def maxn(board: BitBoard, depth: int, color: int, search: Search) -> tuple[int, int, int, int]:
+    """Max-n search: every player maximises its own score
+
+    :param board: the game board
+    :param depth: the remaining depth
+    :param color: the color to move
+    :param search: the search state
+    :return: the scores reached, in the order RED, YELLOW, GREEN, BLUE"""
+    search.tick()
+    if depth == 0 or not board.frontier:
+        return board.score()
+    following = next_player(search.players, color)
+    best = None
+    for x, y in ordered_moves(board, color):
+        undo = make_move(board, x, y, color)
+        value = maxn(board, depth - 1, following, search)
+        unmake_move(board, x, y, undo)
+        if best is None or value[color - 1] > best[color - 1]:
+            best = value
+    return best
+
+
+def search_root(board: BitBoard, depth: int, search: Search, algorithm: str, first: tuple[int, int] | None, root_moves: list[tuple[int, int]] | None = None, bounds=None) -> tuple[tuple[int, int], int]:
+    """Search every move of the root position to a fixed depth
+
+    :param board: the game board
+    :param depth: the depth to search
+    :param search: the search state
+    :param algorithm: "paranoid" or "maxn"
+    :param first: the move to try first
+    :param root_moves: only search these moves, used to split the root between processes
+    :param bounds: the best value found at each depth by all the processes sharing the root (alpha-beta only), see `modules.parallel`
+    :return: the best move and its value"""
+    color = search.color
+    following = next_player(search.players, color)
+    best_move, best_value = None, -INFINITY
+    moves = ordered_moves(board, color, first)
+    if root_moves is not None:
+        moves = [move for move in moves if move in root_moves]
+    for x, y in moves:
+        alpha = best_value
+        if bounds is not None:
+            # only moves at least as good as the best one of the other processes need an exact value
+            alpha = max(alpha, bounds[depth] - 1)
+        undo = make_move(board, x, y, color)
+        if algorithm == "maxn":
+            value = maxn(board, depth - 1, following, search)[color - 1]
+        else:
+            value = alphabeta(board, depth - 1, alpha, INFINITY, following, search)
+        unmake_move(board, x, y, undo)
+        if value > best_value or best_move is None:
+            best_move, best_value = (x, y), value
+        if bounds is not None and value > alpha:
+            with bounds.get_lock():
+                bounds[depth] = max(bounds[depth], value)
+    return best_move, best_value
+
+
+def iterative_deepening(grid: list[list[int]], color: int, players: tuple[int, ...], depth: int = DEFAULT_DEPTH, time_budget: float = DEFAULT_TIME_BUDGET, algorithm: str = "paranoid", table: TranspositionTable | bool = True) -> tuple[tuple[int, int], int, int, int]:
+    """Search deeper and deeper until the depth or the time budget is reached
+
+    :param grid: the game grid
+    :param color: the color of the AI
+    :param players: the colors in playing order
+    :param depth: the maximum depth
+    :param time_budget: the time allowed, in seconds
+    :param algorithm: "paranoid" (alpha-beta) or "maxn"
+    :param table: the transposition table to use (alpha-beta only), True for the AI's own table, False for none
+    :return: the best move, its value, the depth fully searched and the amount of nodes visited"""
+    players = tuple(players)
+    root = grid if isinstance(grid, BitBoard) else BitBoard.from_grid(grid)
+    board = root.copy() # an interrupted search leaves its board half played
+    if table is True:
+        table = get_table(color, players)
+    if table is False or algorithm == "maxn":
+        table = None
+    if table is not None:
+        table.new_search()
+    search = Search(color, players, perf_counter() + time_budget, table)
+    best_move, best_value, reached = None, 0, 0
+    for current in range(1, depth + 1):
+        try:
+            best_move, best_value = search_root(board, current, search, algorithm, best_move)
+        except SearchTimeout:
+            # the interrupted iteration is incomplete, keep the previous one
+            break
+        reached = current
+        # the search can't go past the end of the round
+        if current >= WIDTH * HEIGHT - board.occupied().bit_count():
+            break
+    if best_move is None: # not even depth 1 finished in time
+        best_move = ordered_moves(root, color)[0]
+    return best_move, best_value, reached, search.nodes
+
+
+def solve_endgame(grid: list[list[int]], color: int, players: tuple[int, ...], exact: bool = True, time_budget: float = ENDGAME_TIME_BUDGET, table: TranspositionTable | bool = True) -> tuple[tuple[int, int], int]:
+    """Search the position until the board is full
+
+    The value is the final score difference with the best opponent, all
+    the opponents playing against color. With `exact` set to False, only
+    the outcome is searched: the value is then positive for a win, 0 for a
+    draw and negative for a loss, which is much faster.
+
+    :param grid: the game grid
+    :param color: the color of the AI
+    :param players: the colors in playing order
+    :param exact: search the best score difference rather than the outcome
+    :param time_budget: the time allowed, in seconds, SearchTimeout is raised past it
+    :param table: the transposition table to use, True for the AI's own table, False for none
+    :return: the best move and its value"""
+    players = tuple(players)
+    board = grid.copy() if isinstance(grid, BitBoard) else BitBoard.from_grid(grid)
+    if table is True:
+        table = get_table(color, players)
+    if table is False:
+        table = None
+    if table is not None:
+        table.new_search()
+    search = Search(color, players, perf_counter() + time_budget, table, parity=True)
+    empties = WIDTH * HEIGHT - board.occupied().bit_count()
+    alpha, beta = (-INFINITY, INFINITY) if exact else (-1, 1)
+    following = next_player(players, color)
+    best_move, best_value = None, -INFINITY
+    for x, y in ordered_moves(board, color, parity=True):
+        undo = make_move(board, x, y, color)
+        value = alphabeta(board, empties - 1, max(alpha, best_value), beta, following, search)
+        unmake_move(board, x, y, undo)
+        if value > best_value or best_move is None:
+            best_move, best_value = (x, y), value
+        if best_value >= beta: # looking for the outcome only, and a win was found
+            break
+    return best_move, best_value
+
+
+def endgame_move(grid: list[list[int]], color: int, players: tuple[int, ...], exact: bool = True, time_budget: float = ENDGAME_TIME_BUDGET) -> tuple[int, int] | None:
+    """Choose a move with the endgame solver
+
+    :param grid: the game grid
+    :param color: the color of the AI
+    :param players: the colors in playing order
+    :param exact: search the best score difference rather than the outcome
+    :param time_budget: the time allowed, in seconds
+    :return: the chosen move, or None if the solver ran out of time"""
+    try:
+        return solve_endgame(grid, color, players, exact, time_budget)[0]
+    except SearchTimeout:
+        return None
+
+
+def alphabeta_move(grid: list[list[int]], color: int, players: tuple[int, ...], workers: int = 1, **options) -> tuple[int, int]:
+    """Choose a move with alpha-beta (paranoid alpha-beta with 3 or 4 players)
+
+    :param grid: the game grid
+    :param color: the color of the AI
+    :param players: the colors in playing order
+    :param workers: the amount of processes to split the search between
+    :return: the chosen move"""
+    if workers > 1:
+        from modules.parallel import parallel_alphabeta_move # imported here since modules.parallel depends on this module
+        return parallel_alphabeta_move(grid, color, players, workers, **options)
+    return iterative_deepening(grid, color, players, algorithm="paranoid", **options)[0]
+
+
+def maxn_move(grid: list[list[int]], color: int, players: tuple[int, ...], **options) -> tuple[int, int]:
+    """Choose a move with a max-n search
+
+    :param grid: the game grid
+    :param color: the color of the AI
+    :param players: the colors in playing order
+    :return: the chosen move"""
+    return iterative_deepening(grid, color, players, algorithm="maxn", **options)[0]
+
+
+STRATEGIES = {
+    "alphabeta": alphabeta_move,
+    "maxn": maxn_move,
+    "mcts": mcts_move
+}
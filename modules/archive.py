@@ -0,0 +1,450 @@
+"""Append-only archive of played games, for self-play output
+
+The file starts with an 8 byte header (MAGIC, VERSION, 3 reserved bytes),
+followed by frames of the form [type][payload length][CRC32 of the payload][payload].
+Every frame takes a whole number of RECORD_SIZE slots, so the n-th slot
+always starts at HEADER_SIZE + n * RECORD_SIZE:
+    - a ROUND frame takes one slot and holds one round of a game. The rounds
+      of a game are written together, in consecutive slots.
+    - an INDEX frame, written by `write_index` at the end of every
+      simulation, lists the slot of the first round of every game of the
+      file and ends with the amount of games and INDEX_MAGIC. When it is
+      the last frame of the file, readers use it instead of scanning the
+      whole archive.
+Any other slot (padding after a torn write) is skipped by the readers, and
+so is a game having a round that doesn't pass its checksum.
+"""
+
+import mmap
+import os
+from struct import Struct
+from zlib import crc32
+from modules.rolit import TURNS, GameState, encode_move, decode_move
+
+try:
+    import fcntl
+except ImportError: # missing on Windows, appends then only rely on O_APPEND
+    fcntl = None
+
+MAGIC = b"RLTA"
+VERSION = 1
+HEADER = MAGIC + bytes((VERSION, 0, 0, 0))
+HEADER_SIZE = len(HEADER)
+PADDING, ROUND, INDEX = 0, 1, 2 # frame types
+FRAME = Struct("<BII") # type, payload length, CRC32 of the payload
+ROUND_PAYLOAD = Struct("<BBBBB60s4B") # round, amount of rounds, amount of seats, player bias, amount of moves, moves, scores
+RECORD_SIZE = FRAME.size + ROUND_PAYLOAD.size
+INDEX_MAGIC = b"RIDX"
+INDEX_FOOTER = Struct("<I4s") # amount of games, INDEX_MAGIC
+# layout of a slot read as a ROUND frame, for NumPy structured arrays
+RECORD_FIELDS = [
+    ("type", "u1"), ("length", "<u4"), ("crc", "<u4"),
+    ("round", "u1"), ("nb_rounds", "u1"), ("nb_seats", "u1"), ("bias", "u1"), ("nb_moves", "u1"),
+    ("moves", "u1", (60,)), ("scores", "u1", (4,))
+]
+
+
+class ArchiveError(ValueError):
+    """Raised when an archive is not a game archive or a record is corrupted"""
+
+
+def pack_round(round_i: int, nb_rounds: int, nb_seats: int, bias: int, moves: list[tuple[int, int, int]], scores: tuple[int, int, int, int]) -> bytes:
+    """Pack one round of a game into a ROUND frame
+
+    :param round_i: the index of the round in its game
+    :param nb_rounds: the amount of rounds of the game
+    :param nb_seats: the amount of players, the seats are `TURNS[nb_seats]`
+    :param bias: the index of the seat playing first
+    :param moves: the moves played, as (x, y, color)
+    :param scores: the final scores, in the order RED, YELLOW, GREEN, BLUE
+    :return: the frame, RECORD_SIZE bytes long"""
+    encoded = bytes(encode_move(x, y, color) for x, y, color in moves)
+    payload = ROUND_PAYLOAD.pack(round_i, nb_rounds, nb_seats, bias, len(encoded), encoded, *scores)
+    return FRAME.pack(ROUND, len(payload), crc32(payload)) + payload
+
+
+def unpack_round(record: bytes) -> tuple[int, int, int, int, list[tuple[int, int, int]], tuple[int, int, int, int]]:
+    """Unpack a ROUND frame
+
+    :param record: the frame, RECORD_SIZE bytes long
+    :return: the round, the amount of rounds, the amount of seats, the player bias, the moves as (x, y, color) and the scores
+    :raise ArchiveError: if the frame isn't a round or is corrupted"""
+    kind, length, checksum = FRAME.unpack_from(record)
+    payload = record[FRAME.size:RECORD_SIZE]
+    if kind != ROUND or length != ROUND_PAYLOAD.size or crc32(payload) != checksum:
+        raise ArchiveError("corrupted round record")
+    round_i, nb_rounds, nb_seats, bias, nb_moves, encoded, *scores = ROUND_PAYLOAD.unpack(payload)
+    return round_i, nb_rounds, nb_seats, bias, [decode_move(move) for move in encoded[:nb_moves]], tuple(scores)
+
+
+def pack_game(record: dict) -> bytes:
+    """Pack a game into consecutive ROUND frames
+
+    :param record: the game, as returned by `simulate.play_game`
+    :return: the frames"""
+    nb_rounds = len(record["rounds"])
+    return b"".join(
+        pack_round(round_i, nb_rounds, len(record["seats"]), played["bias"], played["moves"], played["scores"])
+        for round_i, played in enumerate(record["rounds"])
+    )
+
+
+def lock(path: str) -> int:
+    """Open the archive for appending and take an exclusive lock on it
+
+    :param path: the path of the archive, created if needed
+    :return: the file descriptor, closing it releases the lock"""
+    fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+    if fcntl is not None:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+    return fd
+
+
+def append(fd: int, data: bytes) -> None:
+    """Append frames at the end of a locked archive
+
+    The header is written first if the file is empty, and a torn frame left
+    at the end by an interrupted writer is padded to a whole slot.
+
+    :param fd: the file descriptor returned by `lock`
+    :param data: the frames to append
+    :raise ArchiveError: if the file doesn't take any more bytes"""
+    size = os.fstat(fd).st_size
+    if size == 0:
+        data = HEADER + data
+    elif (size - HEADER_SIZE) % RECORD_SIZE:
+        data = bytes(RECORD_SIZE - (size - HEADER_SIZE) % RECORD_SIZE) + data
+    data = memoryview(data)
+    while data: # a write can be partial, the lock keeps the rest of the frames next to it
+        written = os.write(fd, data)
+        if written == 0:
+            raise ArchiveError("the archive doesn't take any more bytes")
+        data = data[written:]
+
+
+def append_games(path: str, records: list[dict]) -> None:
+    """Append games to an archive, creating it if needed
+
+    Several processes can append to the same archive at the same time, the
+    rounds of a game always stay together.
+
+    :param path: the path of the archive
+    :param records: the games, as returned by `simulate.play_game`"""
+    data = b"".join(pack_game(record) for record in records)
+    if not data:
+        return
+    fd = lock(path)
+    try:
+        append(fd, data)
+    finally:
+        os.close(fd)
+
+
+def is_round(frame: bytes) -> bool:
+    """Check the frame type and the checksum of a slot read as a ROUND frame
+
+    :param frame: the slot, RECORD_SIZE bytes long
+    :return: True if it is an intact round"""
+    kind, length, checksum = FRAME.unpack_from(frame)
+    return kind == ROUND and length == ROUND_PAYLOAD.size and crc32(frame[FRAME.size:RECORD_SIZE]) == checksum
+
+
+def game_span(read, slot: int, nb_slots: int) -> int:
+    """Check the game starting at a slot: all its rounds must be intact and in order
+
+    :param read: a function returning the bytes of a slot range, read(first, count)
+    :param slot: the slot of the first round
+    :param nb_slots: the amount of whole slots in the archive
+    :return: the amount of rounds of the game, 0 if the game is incomplete or corrupted"""
+    frame = read(slot, 1)
+    if not is_round(frame) or frame[FRAME.size] != 0:
+        return 0
+    nb_rounds = frame[FRAME.size + 1]
+    if nb_rounds == 0 or slot + nb_rounds > nb_slots:
+        return 0
+    for round_i in range(1, nb_rounds):
+        frame = read(slot + round_i, 1)
+        if not is_round(frame) or frame[FRAME.size] != round_i or frame[FRAME.size + 1] != nb_rounds:
+            return 0
+    return nb_rounds
+
+
+def walk(read, nb_slots: int):
+    """Go through the frames one by one, in file order
+
+    A game is only yielded when all its rounds pass their checksum, so the
+    game torn by an interrupted writer doesn't get an id.
+
+    :param read: a function returning the bytes of a slot range, read(first, count)
+    :param nb_slots: the amount of whole slots in the archive
+    :return: a generator of the slot of the first round and the amount of rounds of each game"""
+    slot = 0
+    while slot < nb_slots:
+        frame = read(slot, 1)
+        kind, length, checksum = FRAME.unpack_from(frame)
+        if kind == ROUND and length == ROUND_PAYLOAD.size:
+            span = game_span(read, slot, nb_slots)
+            if span:
+                yield slot, span
+            slot += max(span, 1)
+        elif kind == INDEX and (FRAME.size + length) % RECORD_SIZE == 0 and slot + (FRAME.size + length) // RECORD_SIZE <= nb_slots:
+            # an older index, its length is only trusted with a valid checksum
+            span = (FRAME.size + length) // RECORD_SIZE
+            slot += span if crc32(read(slot, span)[FRAME.size:]) == checksum else 1
+        else:
+            slot += 1
+
+
+def scan(read, nb_slots: int) -> list[int]:
+    """Find the first slot of every game by reading the frames one by one, see `walk`
+
+    :param read: a function returning the bytes of a slot range, read(first, count)
+    :param nb_slots: the amount of whole slots in the archive
+    :return: the slot of the first round of each game"""
+    return [slot for slot, _ in walk(read, nb_slots)]
+
+
+def scan_array(records) -> list[int]:
+    """Find the first slot of every game on the NumPy view of the slots, see `Archive.array`
+
+    Same result as `scan`, but only the slots of the indexes and of the
+    first rounds are read one by one.
+
+    :param records: the structured array of all the slots
+    :return: the slot of the first round of each game"""
+    import numpy as np # imported here since NumPy is optional
+    rounds = (records["type"] == ROUND) & (records["length"] == ROUND_PAYLOAD.size)
+    covered = -1 # last slot taken by an index
+    for slot in np.flatnonzero(records["type"] == INDEX):
+        if slot <= covered: # the type byte was part of an index payload
+            continue
+        span = (FRAME.size + int(records["length"][slot])) // RECORD_SIZE
+        if (FRAME.size + int(records["length"][slot])) % RECORD_SIZE or slot + span > len(records):
+            continue
+        frame = records[slot:slot + span].tobytes()
+        if crc32(frame[FRAME.size:]) == int(records["crc"][slot]):
+            rounds[slot:slot + span] = False
+            covered = slot + span - 1
+    # the bytes of each slot, to check the checksums of the candidate games
+    slots = np.frombuffer(records, dtype=np.uint8).reshape(-1, RECORD_SIZE)
+    read = lambda first, count: slots[first:first + count].tobytes()
+    starts = []
+    end = -1 # last slot of the previous game, its rounds can't start another one
+    for slot in np.flatnonzero(rounds & (records["round"] == 0)).tolist():
+        if slot <= end:
+            continue
+        span = game_span(read, slot, len(records))
+        if span:
+            starts.append(slot)
+            end = slot + span - 1
+    return starts
+
+
+def read_footer(read, nb_slots: int) -> list[int] | None:
+    """Read the index ending the archive
+
+    :param read: a function returning the bytes of a slot range, read(first, count)
+    :param nb_slots: the amount of whole slots in the archive
+    :return: the slot of the first round of each game, None if the archive doesn't end with a valid index"""
+    if nb_slots == 0:
+        return None
+    count, magic = INDEX_FOOTER.unpack(read(nb_slots - 1, 1)[-INDEX_FOOTER.size:])
+    span = -(-(FRAME.size + 4 * count + INDEX_FOOTER.size) // RECORD_SIZE)
+    if magic != INDEX_MAGIC or span > nb_slots:
+        return None
+    frame = read(nb_slots - span, span)
+    kind, length, checksum = FRAME.unpack_from(frame)
+    if kind != INDEX or FRAME.size + length != len(frame) or crc32(frame[FRAME.size:]) != checksum:
+        return None
+    return list(Struct(f"<{count}I").unpack_from(frame, FRAME.size))
+
+
+def write_index(path: str) -> int:
+    """Append an index of all the games of the archive, for fast opening
+
+    :param path: the path of the archive
+    :return: the amount of games"""
+    fd = lock(path) # no game can be appended while the index is built
+    try:
+        if os.fstat(fd).st_size == 0:
+            return 0
+        with Archive(path) as archive:
+            starts = archive.starts
+        span = -(-(FRAME.size + 4 * len(starts) + INDEX_FOOTER.size) // RECORD_SIZE)
+        payload = Struct(f"<{len(starts)}I").pack(*starts)
+        payload += bytes(span * RECORD_SIZE - FRAME.size - len(payload) - INDEX_FOOTER.size)
+        payload += INDEX_FOOTER.pack(len(starts), INDEX_MAGIC)
+        append(fd, FRAME.pack(INDEX, len(payload), crc32(payload)) + payload)
+    finally:
+        os.close(fd)
+    return len(starts)
+
+
+class RoundView:
+    """One round stored in an archive, read from the mapped file without copying
+
+    The fields are only decoded when they are accessed, and the boards only
+    when `state` is called."""
+    __slots__ = ("record",)
+
+    def __init__(self, record: memoryview) -> None:
+        # the ROUND frame, RECORD_SIZE bytes long
+        self.record = record
+
+    def is_valid(self) -> bool:
+        """Check the frame type and the checksum of the round"""
+        return is_round(self.record)
+
+    @property
+    def round_i(self) -> int:
+        """The index of the round in its game"""
+        return self.record[FRAME.size]
+
+    @property
+    def seats(self) -> list[int]:
+        """The colors in playing order"""
+        return TURNS[self.record[FRAME.size + 2]]
+
+    @property
+    def bias(self) -> int:
+        """The index of the seat playing first"""
+        return self.record[FRAME.size + 3]
+
+    @property
+    def history(self) -> memoryview:
+        """The moves, one byte each, see `rolit.encode_move`"""
+        return self.record[FRAME.size + 5:FRAME.size + 5 + self.record[FRAME.size + 4]]
+
+    @property
+    def moves(self) -> list[tuple[int, int, int]]:
+        """The moves, as (x, y, color)"""
+        return [decode_move(move) for move in self.history]
+
+    @property
+    def scores(self) -> tuple[int, int, int, int]:
+        """The final scores, in the order RED, YELLOW, GREEN, BLUE"""
+        return tuple(self.record[RECORD_SIZE - 4:RECORD_SIZE])
+
+    def state(self, ply: int | None = None) -> GameState:
+        """Decode the board by replaying the moves
+
+        :param ply: the amount of moves to replay, all of them by default
+        :return: the game state after these moves"""
+        return GameState.replay(self.history[:ply], self.seats, self.bias)
+
+
+def stream(path: str):
+    """Read the games of an archive in order, without building the list of their slots
+
+    The file is mapped and read from start to end, so memory use doesn't
+    depend on the amount of games. Use `Archive` to read games by id.
+
+    :param path: the path of the archive
+    :return: a generator of the rounds of each game, see `Archive.rounds`
+    :raise ArchiveError: if the file is not a game archive"""
+    with open(path, "rb") as file:
+        if file.read(HEADER_SIZE)[:len(MAGIC)] != MAGIC:
+            raise ArchiveError(f"{path} is not a game archive")
+        mapping = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    view = memoryview(mapping)
+    read = lambda slot, count: view[HEADER_SIZE + slot * RECORD_SIZE:HEADER_SIZE + (slot + count) * RECORD_SIZE]
+    try:
+        for start, span in walk(read, (len(mapping) - HEADER_SIZE) // RECORD_SIZE):
+            yield [RoundView(read(slot, 1)) for slot in range(start, start + span)]
+    finally:
+        view.release()
+        try:
+            mapping.close()
+        except BufferError: # some round views are still used, the mapping goes with the last of them
+            pass
+
+
+class Archive:
+    """Read access to a game archive, by game id
+
+    The file is memory-mapped: slots are returned as memoryview slices of the
+    mapping and `array` gives a NumPy view of all of them, nothing is copied
+    until a record is decoded. Game ids are the order in which the games were
+    appended. The index ending the archive is used if there is one, otherwise
+    the slots are scanned once, with NumPy if it is installed."""
+    __slots__ = ("map", "view", "nb_slots", "starts")
+
+    def __init__(self, path: str) -> None:
+        with open(path, "rb") as file:
+            if file.read(HEADER_SIZE)[:len(MAGIC)] != MAGIC:
+                raise ArchiveError(f"{path} is not a game archive")
+            # the mapping keeps its own handle on the file
+            self.map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.view = memoryview(self.map)
+        # a torn frame at the end of the file isn't counted
+        self.nb_slots = (len(self.map) - HEADER_SIZE) // RECORD_SIZE
+        starts = read_footer(self.read, self.nb_slots)
+        if starts is None:
+            try:
+                starts = scan_array(self.array())
+            except ImportError:
+                starts = scan(self.read, self.nb_slots)
+        self.starts = starts
+
+    def __enter__(self) -> "Archive":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Unmap the archive file
+
+        Views still in use keep the mapping alive until they are released."""
+        self.view.release()
+        try:
+            self.map.close()
+        except BufferError: # some record views or arrays are still used, the mapping goes with the last of them
+            pass
+
+    def read(self, slot: int, count: int) -> memoryview:
+        """Get consecutive slots, without copying them
+
+        :param slot: the first slot
+        :param count: the amount of slots
+        :return: a view on their bytes"""
+        return self.view[HEADER_SIZE + slot * RECORD_SIZE:HEADER_SIZE + (slot + count) * RECORD_SIZE]
+
+    def array(self):
+        """Get a NumPy structured array of all the slots, sharing the memory of the file
+
+        Slots that aren't ROUND frames (indexes, padding) are in it too, they
+        can be filtered out with `array["type"] == ROUND`.
+
+        :return: an array of RECORD_FIELDS, one row per slot"""
+        import numpy as np # imported here since NumPy is optional
+        return np.frombuffer(self.map, dtype=np.dtype(RECORD_FIELDS), count=self.nb_slots, offset=HEADER_SIZE)
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def rounds(self, game_id: int) -> list[RoundView]:
+        """Get the rounds of a game, without decoding them
+
+        :param game_id: the id of the game
+        :return: a view on each round"""
+        start = self.starts[game_id]
+        nb_rounds = self.view[HEADER_SIZE + start * RECORD_SIZE + FRAME.size + 1]
+        return [RoundView(self.read(slot, 1)) for slot in range(start, start + nb_rounds)]
+
+    def __getitem__(self, game_id: int) -> dict:
+        """Read a game
+
+        :param game_id: the id of the game
+        :return: the game: seats and, for each round, the player bias, moves and scores"""
+        start = self.starts[game_id]
+        first = unpack_round(self.read(start, 1))
+        records = [first] + [unpack_round(self.read(slot, 1)) for slot in range(start + 1, start + first[1])]
+        return {
+            "seats": TURNS[first[2]],
+            "rounds": [{"bias": bias, "moves": moves, "scores": scores} for _, _, _, bias, moves, scores in records]
+        }
+
+    def __iter__(self):
+        for game_id in range(len(self)):
+            yield self[game_id]
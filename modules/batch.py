@@ -0,0 +1,201 @@
+"""Batched Rolit engine: advances many boards at once with NumPy
+
+The boards are stored in one (N, 8, 8) uint8 array, indexed as
+boards[n, y, x] with the colors of `modules.rolit`. This module needs
+NumPy, which the game itself doesn't.
+"""
+
+from time import perf_counter
+import numpy as np
+from modules.rolit import *
+
+DIRECTIONS = ((-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1)) # (dx, dy)
+REACH = max(WIDTH, HEIGHT) - 1 # longest possible ray
+
+
+def init_boards(n: int) -> np.ndarray:
+    """Create n boards in the starting position
+
+    :param n: the number of boards
+    :return: the boards"""
+    return np.repeat(np.array(init_grid(), dtype=np.uint8)[None], n, axis=0)
+
+
+def from_grids(grids: list[list[list[int]]]) -> np.ndarray:
+    """Stack game grids into a batch
+
+    :param grids: the game grids
+    :return: the boards"""
+    return np.array([[list(row) for row in grid] for grid in grids], dtype=np.uint8)
+
+
+def to_grids(boards: np.ndarray) -> list[list[list[int]]]:
+    """Convert a batch back to game grids
+
+    :param boards: the boards
+    :return: the game grids"""
+    return boards.tolist()
+
+
+def offset_views(boards: np.ndarray) -> dict[tuple[int, int], np.ndarray]:
+    """Get, for each direction and distance, the cell seen from every cell
+
+    views[(dx*k, dy*k)][n, y, x] is boards[n, y + dy*k, x + dx*k], or CLEAR
+    out of the board. They are views on one padded array, nothing is copied.
+
+    :param boards: the boards
+    :return: the views, by (x offset, y offset)"""
+    padded = np.pad(boards, ((0, 0), (REACH, REACH), (REACH, REACH)), constant_values=CLEAR)
+    views = {}
+    for dx, dy in DIRECTIONS:
+        for k in range(1, REACH + 1):
+            views[(dx * k, dy * k)] = padded[:, REACH + dy * k:REACH + dy * k + HEIGHT, REACH + dx * k:REACH + dx * k + WIDTH]
+    return views
+
+
+def legal_masks(boards: np.ndarray) -> np.ndarray:
+    """Get the legal placements of every board: empty cells next to a ball
+
+    :param boards: the boards
+    :return: a (N, 8, 8) bool array"""
+    occupied = np.pad(boards != CLEAR, ((0, 0), (1, 1), (1, 1)))
+    adjacent = np.zeros(boards.shape, dtype=bool)
+    for dx, dy in DIRECTIONS:
+        adjacent |= occupied[:, 1 + dy:1 + dy + HEIGHT, 1 + dx:1 + dx + WIDTH]
+    return adjacent & (boards == CLEAR)
+
+
+def capture_counts(boards: np.ndarray, colors: np.ndarray) -> np.ndarray:
+    """Count the captures of every candidate placement of every board
+
+    The count is computed for every cell, whether the placement is legal or not.
+
+    :param boards: the boards
+    :param colors: the color to play on each board, shape (N,)
+    :return: a (N, 8, 8) int array, counts[n, y, x] like `count_captures(grid, x, y, color)`"""
+    color = np.asarray(colors, dtype=np.uint8)[:, None, None]
+    views = offset_views(boards)
+    counts = np.zeros(boards.shape, dtype=np.int32)
+    for dx, dy in DIRECTIONS:
+        active = np.ones(boards.shape, dtype=bool) # still walking over opponent balls
+        run = np.zeros(boards.shape, dtype=np.int32)
+        for k in range(1, REACH + 1):
+            cell = views[(dx * k, dy * k)]
+            own = cell == color
+            # a run of opponents closed by one of our balls is captured
+            counts += np.where(active & own, run, 0)
+            active &= (cell != CLEAR) & ~own
+            run += active
+    return counts
+
+
+def play_moves(boards: np.ndarray, xs: np.ndarray, ys: np.ndarray, colors: np.ndarray) -> np.ndarray:
+    """Play one move on every board, in place
+
+    Illegal moves are ignored, like `rolit.play` returning False.
+
+    :param boards: the boards
+    :param xs: the x coordinate of the move on each board
+    :param ys: the y coordinate of the move on each board
+    :param colors: the color to play on each board
+    :return: a (N,) bool array, True where the move was played"""
+    n = np.arange(len(boards))
+    xs, ys = np.asarray(xs), np.asarray(ys)
+    colors = np.asarray(colors, dtype=np.uint8)
+    legal = legal_masks(boards)[n, ys, xs]
+    # find where each ray ends before changing anything
+    ends = []
+    for dx, dy in DIRECTIONS:
+        active = legal.copy()
+        end = np.zeros(len(boards), dtype=np.int32)
+        for k in range(1, REACH + 1):
+            cx, cy = xs + dx * k, ys + dy * k
+            inside = (0 <= cx) & (cx < WIDTH) & (0 <= cy) & (cy < HEIGHT)
+            cell = np.where(inside, boards[n, np.clip(cy, 0, HEIGHT - 1), np.clip(cx, 0, WIDTH - 1)], CLEAR)
+            own = cell == colors
+            end = np.where(active & own & (k > 1), k, end)
+            active &= (cell != CLEAR) & ~own
+        ends.append(end)
+    # flip the captured balls, then place the new one
+    for (dx, dy), end in zip(DIRECTIONS, ends):
+        for k in range(1, REACH):
+            flip = k < end
+            boards[n[flip], ys[flip] + dy * k, xs[flip] + dx * k] = colors[flip]
+    boards[n[legal], ys[legal], xs[legal]] = colors[legal]
+    return legal
+
+
+def scores(boards: np.ndarray) -> np.ndarray:
+    """Count the balls of each color on every board
+
+    :param boards: the boards
+    :return: a (N, 4) int array, in the order RED, YELLOW, GREEN, BLUE"""
+    flat = boards.reshape(len(boards), -1)
+    return np.stack([(flat == color).sum(axis=1) for color in (RED, YELLOW, GREEN, BLUE)], axis=1)
+
+
+def random_moves(boards: np.ndarray, rng: np.random.Generator) -> tuple[np.ndarray, np.ndarray]:
+    """Pick a random legal move on every board
+
+    :param boards: the boards, they must all have a legal move
+    :param rng: the random generator
+    :return: the x and y coordinates of the moves"""
+    # the legal cell with the highest random draw is uniformly chosen
+    draws = np.where(legal_masks(boards), rng.random(boards.shape), -1).reshape(len(boards), -1)
+    index = draws.argmax(axis=1)
+    return index % WIDTH, index // WIDTH
+
+
+def greedy_moves(boards: np.ndarray, colors: np.ndarray, rng: np.random.Generator) -> tuple[np.ndarray, np.ndarray]:
+    """Pick the legal move with the most captures on every board, like the greedy AI
+
+    :param boards: the boards, they must all have a legal move
+    :param colors: the color to play on each board
+    :param rng: the random generator, to break ties
+    :return: the x and y coordinates of the moves"""
+    counts = capture_counts(boards, colors) + rng.random(boards.shape) # the random part only breaks ties
+    index = np.where(legal_masks(boards), counts, -1).reshape(len(boards), -1).argmax(axis=1)
+    return index % WIDTH, index // WIDTH
+
+
+def self_play(n: int, nb_players: int = 4, greedy: bool = False, seed: int | None = None) -> np.ndarray:
+    """Play n rounds in lockstep
+
+    :param n: the number of rounds
+    :param nb_players: the number of players
+    :param greedy: use the greedy AI rather than random moves
+    :param seed: the random seed
+    :return: the final scores, a (N, 4) int array"""
+    rng = np.random.default_rng(seed)
+    boards = init_boards(n)
+    seats = np.array(TURNS[nb_players], dtype=np.uint8)
+    bias = rng.integers(0, nb_players, n)
+    for tour in range(WIDTH * HEIGHT - 4):
+        colors = seats[(tour + bias) % nb_players]
+        xs, ys = greedy_moves(boards, colors, rng) if greedy else random_moves(boards, rng)
+        play_moves(boards, xs, ys, colors)
+    return scores(boards)
+
+
+def benchmark(n: int = 1000, seed: int | None = None) -> dict[str, float]:
+    """Compare the positions per second of the batch engine with `rolit.play`
+
+    Both play n random rounds of 4 players.
+
+    :param n: the number of rounds
+    :param seed: the random seed
+    :return: the positions per second of each engine and the speedup"""
+    positions = n * (WIDTH * HEIGHT - 4)
+    start = perf_counter()
+    self_play(n, seed=seed)
+    batch_rate = positions / (perf_counter() - start)
+    rng = np.random.default_rng(seed)
+    start = perf_counter()
+    for _ in range(n):
+        grid = init_grid()
+        for tour in range(WIDTH * HEIGHT - 4):
+            moves = sorted(legal_moves(grid))
+            x, y = moves[rng.integers(len(moves))]
+            play(grid, x, y, TURNS[4][tour % 4])
+    single_rate = positions / (perf_counter() - start)
+    return {"batch": batch_rate, "rolit": single_rate, "speedup": batch_rate / single_rate}
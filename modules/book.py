@@ -0,0 +1,156 @@
+"""Opening book built from self-play archives and consulted by the AIs
+
+Positions are keyed by the hash of their canonical form (see
+`rolit.canonical_form`), so the symmetric and recolored versions of a
+position share their entries. Every move played from a position is stored
+in the canonical orientation with the amount of rounds it was played in and
+the share of them won by its player.
+
+The book file is a HEADER followed by ENTRY records sorted by key, it is
+memory-mapped and searched by bisection, so opening it is instant.
+"""
+
+import mmap
+from struct import Struct
+from modules.rolit import *
+from modules.archive import Archive
+
+MAGIC = b"RLTB"
+VERSION = 2 # keys of version 1 didn't rename the colors
+HEADER = Struct("<4sBBxxQ") # MAGIC, VERSION, plies, amount of entries
+ENTRY = Struct("<QBxxxII") # key, canonical cell of the move, rounds played, rounds won (in WIN_UNIT)
+WIN_UNIT = 12 # a round shared between 1 to 4 winners is always worth a whole amount of units
+DEFAULT_PLIES = 12 # the book covers the moves played from positions with fewer balls placed
+MIN_ROUNDS = 4 # moves played in fewer rounds aren't trusted
+BOOKS = {} # open books, by path (None when the file can't be read)
+
+
+def round_shares(scores: tuple[int, int, int, int], seats: list[int]) -> dict[int, int]:
+    """Get the share of a round won by each color, in WIN_UNIT
+
+    :param scores: the final scores, in the order RED, YELLOW, GREEN, BLUE
+    :param seats: the colors of the players
+    :return: the share of each color"""
+    best = max(scores[color - 1] for color in seats)
+    winners = [color for color in seats if scores[color - 1] == best]
+    return {color: WIN_UNIT // len(winners) if color in winners else 0 for color in seats}
+
+
+def build_book(archive_path: str, output: str, plies: int = DEFAULT_PLIES) -> int:
+    """Build an opening book from the games of an archive, see `modules.archive`
+
+    :param archive_path: the path of the archive
+    :param output: the path of the book file to write
+    :param plies: the amount of moves of each round to learn
+    :return: the amount of entries of the book"""
+    stats = {} # (key, canonical cell) -> [rounds, won]
+    with Archive(archive_path) as archive:
+        for game_id in range(len(archive)):
+            for round_view in archive.rounds(game_id):
+                if not round_view.is_valid(): # the rounds aren't checked when the archive has an index
+                    continue
+                seats = round_view.seats
+                shares = round_shares(round_view.scores, seats)
+                grid = init_grid()
+                for move in round_view.history[:plies]:
+                    x, y, color = decode_move(move)
+                    key, symmetry = canonical_key(grid, color, seats)
+                    x_, y_ = transform_cell(x, y, symmetry)
+                    entry = stats.setdefault((key, y_ * WIDTH + x_), [0, 0])
+                    entry[0] += 1
+                    entry[1] += shares[color]
+                    play(grid, x, y, color)
+    with open(output, "wb") as book_file:
+        book_file.write(HEADER.pack(MAGIC, VERSION, plies, len(stats)))
+        for (key, cell), (played, won) in sorted(stats.items()):
+            book_file.write(ENTRY.pack(key, cell, played, won))
+    BOOKS.pop(output, None) # reopen it on next use
+    return len(stats)
+
+
+class Book:
+    """Opening book file, memory-mapped"""
+    __slots__ = ("map", "plies", "size")
+
+    def __init__(self, path: str) -> None:
+        with open(path, "rb") as book_file:
+            self.map = mmap.mmap(book_file.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self.map) < HEADER.size:
+            self.map.close()
+            raise ValueError(f"{path} is not an opening book")
+        magic, version, self.plies, self.size = HEADER.unpack_from(self.map)
+        if magic != MAGIC or version != VERSION or len(self.map) != HEADER.size + self.size * ENTRY.size:
+            self.map.close()
+            raise ValueError(f"{path} is not an opening book")
+
+    def entry(self, i: int) -> tuple[int, int, int, int]:
+        """Read an entry
+
+        :param i: the index of the entry
+        :return: the key, canonical cell, rounds played and rounds won"""
+        return ENTRY.unpack_from(self.map, HEADER.size + i * ENTRY.size)
+
+    def moves(self, key: int) -> list[tuple[int, int, int]]:
+        """Get the moves stored for a position
+
+        :param key: the key of the position, see `canonical_key`
+        :return: the canonical cell, rounds played and rounds won of each move"""
+        low, high = 0, self.size
+        while low < high: # first entry with this key
+            middle = (low + high) // 2
+            if self.entry(middle)[0] < key:
+                low = middle + 1
+            else:
+                high = middle
+        moves = []
+        while low < self.size:
+            entry_key, cell, played, won = self.entry(low)
+            if entry_key != key:
+                break
+            moves.append((cell, played, won))
+            low += 1
+        return moves
+
+
+def get_book(path: str) -> Book | None:
+    """Get an opening book, opened once per process
+
+    :param path: the path of the book file
+    :return: the book, None if there is no such file or it can't be read"""
+    if path not in BOOKS:
+        try:
+            BOOKS[path] = Book(path)
+        except (OSError, ValueError): # missing, empty, corrupted or from an older version: the AIs search instead
+            BOOKS[path] = None
+    return BOOKS[path]
+
+
+def book_move(grid: list[list[int]], color: int, players: list[int], path: str = BOOK_FILE) -> tuple[int, int] | None:
+    """Get the move with the best winning rate in the book
+
+    :param grid: the game grid
+    :param color: the color to move
+    :param players: the colors in playing order
+    :param path: the path of the book file
+    :return: the move, None if the position is beyond the book or not in it"""
+    book = get_book(path)
+    if book is None:
+        return None
+    if sum(row.count(CLEAR) for row in grid) <= WIDTH * HEIGHT - 4 - book.plies:
+        return None
+    key, symmetry = canonical_key(grid, color, players)
+    candidates = [(won / played, cell) for cell, played, won in book.moves(key) if played >= MIN_ROUNDS]
+    if not candidates:
+        return None
+    cell = max(candidates)[1]
+    move = untransform_cell(cell % WIDTH, cell // WIDTH, symmetry)
+    # a hash collision could point to an illegal move
+    return move if move in legal_moves(grid) else None
+
+
+def main(args) -> None:
+    """Entry point of `python main.py book`
+
+    :param args: the parsed command line arguments"""
+    entries = build_book(args.archive, args.output, args.plies)
+    print(f"{entries} coups enregistrés dans {args.output}")
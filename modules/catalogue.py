@@ -0,0 +1,171 @@
+"""Catalogue of the save files, kept in a SQLite database next to them
+
+The catalogue holds the name, modification time, players and scores of each
+save, so the menus never list the directory or read the files. Names are
+searched through an index of their trigrams (3 consecutive characters).
+It is updated by `saver.save` and `saver.delete`, and `sync` catches up
+with the files changed outside of the game.
+"""
+
+import json
+import os
+import sqlite3
+import modules.saver as saver
+
+CATALOGUE_NAME = "catalogue.db" # database file, in the directory of the saves
+SAVE_EXTENSION = ".save"
+CONNECTIONS = {} # open databases, by directory
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS saves (
+    path TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    mtime REAL NOT NULL,
+    nb_players INTEGER NOT NULL,
+    nb_ai INTEGER NOT NULL,
+    round INTEGER NOT NULL,
+    scores TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS saves_mtime ON saves (mtime);
+CREATE TABLE IF NOT EXISTS trigrams (
+    trigram TEXT NOT NULL,
+    path TEXT NOT NULL,
+    PRIMARY KEY (trigram, path)
+) WITHOUT ROWID;
+"""
+
+
+def connect(directory: str) -> sqlite3.Connection:
+    """Get the catalogue of a saves directory, creating it if needed
+
+    :param directory: the directory of the saves
+    :return: the database connection"""
+    directory = os.path.normpath(directory)
+    if directory not in CONNECTIONS:
+        connection = sqlite3.connect(os.path.join(directory, CATALOGUE_NAME))
+        connection.executescript(SCHEMA)
+        CONNECTIONS[directory] = connection
+    return CONNECTIONS[directory]
+
+
+def trigrams(text: str) -> set[str]:
+    """Get the sequences of 3 characters of a text, case insensitive
+
+    :param text: the text
+    :return: the trigrams"""
+    text = text.lower()
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def save_name(path: str) -> str:
+    """Get the name of a save, as typed by the player
+
+    :param path: the path of the save file
+    :return: the file name without directory and extension"""
+    name = os.path.basename(path)
+    return name[:-len(SAVE_EXTENSION)] if name.endswith(SAVE_EXTENSION) else name
+
+
+def key(path: str) -> str:
+    """Get the key of a save in the catalogue, the same however its path was built
+
+    :param path: the path of the save file
+    :return: the normalized path"""
+    return os.path.normpath(path)
+
+
+def record(path: str, nb_players: int, nb_ai: int, curr_round: int, scores: list[list[int]]) -> None:
+    """Add or update a save in the catalogue of its directory
+
+    :param path: the path of the save file, it must exist
+    :param nb_players: the number of human players
+    :param nb_ai: the number of AIs
+    :param curr_round: the current round
+    :param scores: the scores of the players by round"""
+    path = key(path)
+    connection = connect(os.path.dirname(path) or ".")
+    with connection: # one transaction
+        connection.execute(
+            "INSERT OR REPLACE INTO saves VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (path, save_name(path), os.path.getmtime(path), nb_players, nb_ai, curr_round, json.dumps(scores))
+        )
+        connection.execute("DELETE FROM trigrams WHERE path = ?", (path,))
+        connection.executemany("INSERT INTO trigrams VALUES (?, ?)", [(trigram, path) for trigram in trigrams(save_name(path))])
+
+
+def forget(path: str) -> None:
+    """Remove a save from the catalogue of its directory
+
+    :param path: the path of the save file"""
+    path = key(path)
+    connection = connect(os.path.dirname(path) or ".")
+    with connection:
+        connection.execute("DELETE FROM saves WHERE path = ?", (path,))
+        connection.execute("DELETE FROM trigrams WHERE path = ?", (path,))
+
+
+def sync(directory: str) -> None:
+    """Bring the catalogue up to date with the save files of a directory
+
+    Only new or modified files are read, so this is cheap once the catalogue exists.
+
+    :param directory: the directory of the saves"""
+    connection = connect(directory)
+    known = dict(connection.execute("SELECT path, mtime FROM saves"))
+    for entry in os.scandir(directory):
+        if not entry.name.endswith(SAVE_EXTENSION):
+            continue
+        path = key(os.path.join(directory, entry.name))
+        if known.pop(path, None) == entry.stat().st_mtime:
+            continue
+        try:
+            state, nb_ai, _, curr_round, scores, _ = saver.recall(path)
+        except saver.SaveError: # unreadable saves aren't listed
+            continue
+        record(path, len(state.seats) - nb_ai, nb_ai, curr_round, scores)
+    for path in known: # deleted outside of the game
+        forget(path)
+
+
+def saves(directory: str) -> list[str]:
+    """Get the saves of a directory, the most recent first
+
+    :param directory: the directory of the saves
+    :return: the paths of the save files"""
+    return [path for path, in connect(directory).execute("SELECT path FROM saves ORDER BY mtime DESC")]
+
+
+def get(path: str) -> tuple[str, float, int, int, int, list[list[int]]] | None:
+    """Get the catalogue entry of a save
+
+    :param path: the path of the save file
+    :return: the name, modification time, number of players, number of AIs, current round and scores, None if the save isn't in the catalogue"""
+    path = key(path)
+    row = connect(os.path.dirname(path) or ".").execute(
+        "SELECT name, mtime, nb_players, nb_ai, round, scores FROM saves WHERE path = ?", (path,)
+    ).fetchone()
+    return None if row is None else (*row[:5], json.loads(row[5]))
+
+
+def search(directory: str, text: str) -> list[str]:
+    """Find the saves whose name contains a text, case insensitive
+
+    Texts of 3 characters or more are looked up in the trigram index, the
+    candidates are then checked since their trigrams may be in another order.
+
+    :param directory: the directory of the saves
+    :param text: the text to search
+    :return: the paths of the matching save files, the most recent first"""
+    connection = connect(directory)
+    wanted = trigrams(text)
+    if not wanted: # too short for the index, the names are compared directly
+        query = "SELECT path FROM saves WHERE instr(lower(name), ?) > 0 ORDER BY mtime DESC"
+        return [path for path, in connection.execute(query, (text.lower(),))]
+    query = f"""
+        SELECT saves.path, saves.name FROM saves JOIN (
+            SELECT path FROM trigrams WHERE trigram IN ({", ".join("?" * len(wanted))})
+            GROUP BY path HAVING count(*) = ?
+        ) AS candidates ON candidates.path = saves.path
+        ORDER BY saves.mtime DESC
+    """
+    return [path for path, name in connection.execute(query, (*wanted, len(wanted))) if text.lower() in name.lower()]
@@ -50,6 +50,7 @@ def mainloop(nb_players: int, nb_rounds: int, ai: bool) -> None:
         while nb_players not in ("2", "3", "4"):
             nb_players = input("Combien de joueurs vont jouer ? [2-4] : ")
         nb_players = int(nb_players)
+    seats = [RED + i for i in range(nb_players)] # this mode plays the first colors in order, unlike `TURNS`
 
     if nb_rounds == 0:
         nb_rounds = input("Combien de manches voulez-vous jouer ? (par défaut 1): ")
@@ -120,7 +121,7 @@ def mainloop(nb_players: int, nb_rounds: int, ai: bool) -> None:
                     if not played:
                         print("Coup invalide")
                 else:
-                    move = ai_play(grid, player)
+                    move = ai_play(grid, player, "greedy", seats, ENDGAME_EMPTIES)
                     clear()
                     display_grid(grid)
                     print(f"L'IA a joué en {chr(ord('a') + move[1])}{move[0] + 1}")
@@ -1,3 +1,4 @@
+import tkinter as tk
 from typing import Tuple, Optional, Union, List
 
 __fltk__ = None
@@ -72,4 +73,147 @@ def renomme_fenetre(titre: str) -> None:
     """
     assert __fltk__.__canevas is not None
 
-    __fltk__.__canevas.root.title(titre)
\ No newline at end of file
+    __fltk__.__canevas.root.title(titre)
+
+def existe(objet_ou_tag: Union[int, str]) -> bool:
+    """
+    Renvoie si un objet avec cet identifiant ou ce tag est sur le canevas.
+
+    :param objet_ou_tag: identifiant ou tag de l'objet
+    """
+    assert __fltk__.__canevas is not None
+    return bool(__fltk__.__canevas.canvas.find_withtag(objet_ou_tag))
+
+
+def modifie(objet_ou_tag: Union[int, str], couleur: Optional[str] = None, remplissage: Optional[str] = None,
+            chaine: Optional[str] = None, visible: Optional[bool] = None) -> None:
+    """
+    Modifie un objet existant sans le recréer. Seules les options données
+    sont changées.
+
+    :param objet_ou_tag: identifiant ou tag de l'objet
+    :param couleur: couleur de trait (couleur du texte pour un texte)
+    :param remplissage: couleur de fond
+    :param chaine: texte affiché
+    :param visible: affiche ou cache l'objet
+    """
+    assert __fltk__.__canevas is not None
+    canvas = __fltk__.__canevas.canvas
+    options = {}
+    if couleur is not None:
+        options["fill" if canvas.type(objet_ou_tag) == "text" else "outline"] = couleur
+    if remplissage is not None:
+        options["fill"] = remplissage
+    if chaine is not None:
+        options["text"] = chaine
+    if visible is not None:
+        options["state"] = "normal" if visible else "hidden"
+    canvas.itemconfigure(objet_ou_tag, **options)
+
+
+def deplace_coins(objet_ou_tag: Union[int, str], ax: float, ay: float, bx: float, by: float) -> None:
+    """
+    Change les coins opposés d'un rectangle ou d'un cercle existant.
+
+    :param objet_ou_tag: identifiant ou tag de l'objet
+    :param ax: abscisse du premier coin
+    :param ay: ordonnée du premier coin
+    :param bx: abscisse du second coin
+    :param by: ordonnée du second coin
+    """
+    assert __fltk__.__canevas is not None
+    __fltk__.__canevas.canvas.coords(objet_ou_tag, ax, ay, bx, by)
+
+
+__reveil__ = {} # variable Tk écrite à chaque événement, par canevas
+
+
+def _variable_reveil():
+    """
+    Renvoie la variable Tk écrite à chaque événement mis en file par fltk,
+    en l'installant au premier appel pour ce canevas.
+    """
+    canevas = __fltk__.__canevas
+    if id(canevas) not in __reveil__:
+        __reveil__.clear() # une seule fenêtre à la fois
+        variable = tk.IntVar(canevas.root)
+        for nom in canevas.events:
+            sequence = canevas._ev_mapping.get(nom, nom)
+            # ajouté après le gestionnaire de fltk, qui a déjà mis l'événement en file
+            canevas.canvas.bind(sequence, lambda ev: variable.set(1), "+")
+
+        def quitte() -> None:
+            canevas.event_quit()
+            variable.set(1)
+
+        canevas.root.protocol("WM_DELETE_WINDOW", quitte)
+        __reveil__[id(canevas)] = variable
+    return __reveil__[id(canevas)]
+
+
+def reveille() -> None:
+    """
+    Réveille `attend_ev` sans événement, par exemple depuis un rappel
+    programmé avec `after` qui vient de changer l'état à afficher.
+    """
+    assert __fltk__.__canevas is not None
+    _variable_reveil().set(1)
+
+
+def attend_ev(reveil: bool = False) -> Optional[Tuple[str, object]]:
+    """
+    Attend qu'un événement ait lieu et le renvoie. Contrairement à
+    `fltk.attend_ev`, la fenêtre n'est pas mise à jour en boucle : Tk dort
+    jusqu'à l'arrivée d'un événement, le processeur reste libre.
+
+    :param reveil: renvoie aussi None quand `reveille` est appelée
+    :return: l'événement, ou None après un appel à `reveille`
+    """
+    assert __fltk__.__canevas is not None
+    canevas = __fltk__.__canevas
+    variable = _variable_reveil()
+    while not canevas.ev_queue:
+        canevas.root.wait_variable(variable)
+        if reveil and not canevas.ev_queue:
+            return None
+    return canevas.ev_queue.popleft()
+
+
+def affiche_au_survol(tag: str, objet: int) -> None:
+    """
+    Affiche un objet seulement quand la souris survole un objet portant ce
+    tag. Tk prévient de l'entrée et de la sortie de la souris, il n'y a
+    donc pas à tester le survol en boucle.
+
+    :param tag: tag des objets survolés
+    :param objet: identifiant de l'objet à afficher
+    """
+    assert __fltk__.__canevas is not None
+    canvas = __fltk__.__canevas.canvas
+    modifie(objet, visible=est_objet_survole(tag))
+    canvas.tag_bind(tag, "<Enter>", lambda ev: modifie(objet, visible=True))
+    canvas.tag_bind(tag, "<Leave>", lambda ev: modifie(objet, visible=False))
+
+
+def programme(delai: float, fonction, *arguments) -> str:
+    """
+    Appelle une fonction depuis la boucle Tk après un délai, sans bloquer
+    la fenêtre entre temps.
+
+    :param delai: délai en secondes
+    :param fonction: fonction à appeler
+    :param arguments: arguments de la fonction
+    :return: identifiant de l'appel programmé, pour l'annuler
+    """
+    assert __fltk__.__canevas is not None
+    return __fltk__.__canevas.root.after(int(delai * 1000), fonction, *arguments)
+
+
+def annule(identifiant: str) -> None:
+    """
+    Annule un appel programmé avec `programme`.
+
+    :param identifiant: identifiant de l'appel programmé
+    """
+    assert __fltk__.__canevas is not None
+    __fltk__.__canevas.root.after_cancel(identifiant)
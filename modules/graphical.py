@@ -1,13 +1,14 @@
 """Graphical game"""
 
 from modules.rolit import *
-from time import sleep
-from time import ctime
+from time import localtime
+import threading
 import os
 import os.path
 import modules.fltk as fltk
 import modules.fltk_addons as addons
 import modules.saver as saver
+import modules.catalogue as catalogue
 
 # graphical display variables
 GRID = 830 # ui elements width
@@ -19,7 +20,6 @@ BASE_BAR_Y = 100
 BAR_HEIGHT = 50 # height of the score bars
 BAR_VERTICAL_SPACING = 10 # spacing between score bars
 MAX_BAR_WIDTH = SIDE-40
-MONTHS = {"Jan": 1, "Feb": 2, "Mar": 3, "Apr": 4, "May": 5, "Jun": 6, "Jul": 7, "Aug": 8, "Sep": 9, "Oct": 10, "Nov": 11, "Dec": 12}
 
 ALL_COLORS = [
     {   #Base
@@ -76,12 +76,9 @@ COLORS_LIST = ["CLEAR","RED","YELLOW","GREEN","BLUE"]
 COLOR_INDEX = 0
 SELECTED_COLORS = ALL_COLORS[COLOR_INDEX]
 
-TURNS = {
-    1: [RED],
-    2: [RED, GREEN],
-    3: [RED, YELLOW, GREEN],
-    4: [RED, YELLOW, GREEN, BLUE]
-}
+AI_STRATEGY = "greedy" # AI used against the players, see rolit.ai_move
+AI_DELAY = 1.0 # default delay before each AI move, in seconds, so the players can follow
+AI_POLL = 0.02 # interval between the checks for the move of the AI thread, in seconds
 
 DESC = "Le but du jeu est d'avoir\nle plus de boule de sa\ncouleur sur le plateau.\n\nLe jeu se joue en manches.\n\nLe gagnant est le joueur\nqui a gagné le plus de\nmanches !"
 RULES = """Début de partie:
@@ -117,54 +114,114 @@ addons.init(fltk) # initialize the fltk_addons module
 if not os.path.exists("saves"): # create the saves directory if it doesn't exist
     os.makedirs("saves")
 
-def display_grid(grid: list[list[int]], player: int, current_round: int, scores: list[list[int]] | None = None) -> None:
-    """Display the game grid onto the fltk window and side informations
-    
-    :param grid: game grid
-    :param player: the current player
-    :param current_round: the current round
-    :param scores: scores of the players by round"""
+BOARD_ITEMS = {} # ids of the items of the game screen, drawn once by create_board
+DRAWN = {} # corners and options last applied to each item of the game screen, by id
+
+
+def create_board() -> None:
+    """Draw every item of the game screen once, `display_grid` then only modifies them"""
     fltk.efface_tout()
-    # draw black background with an outline set as the current player's color
-    fltk.rectangle(0,0,830,830, couleur=SELECTED_COLORS[player], remplissage="#222831", epaisseur=30)
-    for i_row in range(len(grid)):
-        for i_elem in range(len(grid[0])):
-            # for each element of the game grid, draw circle of according color
-            if grid[i_row][i_elem] == CLEAR and not test_adjacent(grid, i_elem, i_row): # If slot is unused and unreachable, fill in gray
-                fltk.cercle(100*i_elem + 50 + 15, 100*i_row + 50 + 15, 40, "#393E46", remplissage="#393E46")
-            else: # Else, look in color lookup table
-                fltk.cercle(100*i_elem + 50 + 15, 100*i_row + 50 + 15, 40, SELECTED_COLORS[grid[i_row][i_elem]], remplissage=SELECTED_COLORS[grid[i_row][i_elem]])
-    # Re draw background for side view
+    BOARD_ITEMS.clear()
+    DRAWN.clear()
+    # black background with an outline set as the current player's color
+    BOARD_ITEMS["outline"] = fltk.rectangle(0,0,830,830, remplissage="#222831", epaisseur=30)
+    BOARD_ITEMS["cells"] = [
+        fltk.cercle(100*i_elem + 50 + 15, 100*i_row + 50 + 15, 40, "#393E46", remplissage="#393E46")
+        for i_row in range(HEIGHT) for i_elem in range(WIDTH)
+    ]
+    # background for side view
     fltk.rectangle(GRID, 0, GRID+SIDE, GRID, couleur="#F0F0F0", remplissage="#F0F0F0")
 
     # Draw the outline of the side view
     fltk.rectangle(GRID+PADDING, 20, GRID+SIDE, 810, epaisseur=5)
-    # Settings icon
+    # Settings icon, circled when hovered (the circle is below so it doesn't catch the mouse)
+    hover = fltk.cercle(GRID+SIDE-40/2-20, GRID-40/2-10-32, 32, couleur="black", epaisseur=2)
     fltk.texte(GRID+SIDE-40/2-20, GRID-40/2-10, chaine="⚙️", taille=40, ancrage="s", tag="settings-icon")
+    addons.affiche_au_survol("settings-icon", hover)
 
     # Affichage du header "Scores"
     fltk.texte(GRID+(PADDING+SIDE)/2, 50, chaine="Scores", ancrage="center", police="Cascadia Code", taille=25)
-    if scores[current_round]:
-        current_scores = scores[current_round]
-        max_score = max(current_scores)
+    fltk.texte(GRID+(PADDING+SIDE)/2, 400, chaine="Manches gagnées", ancrage="center", police="Cascadia Code", taille=25)
+    # the bars are placed and shown by display_grid
+    for name, base_y in (("score_bars", BASE_BAR_Y), ("round_bars", 450)):
+        BOARD_ITEMS[name] = []
         for i in range(4):
-            bar_y = BASE_BAR_Y + (BAR_HEIGHT + BAR_VERTICAL_SPACING) * i # calculate the y coordinate of the bar
-            bar_width = max((current_scores[i] / max_score)*MAX_BAR_WIDTH, 40) # calculate the width of the bar
-            fltk.rectangle(BASE_BAR_X, bar_y, BASE_BAR_X + bar_width, bar_y + BAR_HEIGHT, epaisseur=5, remplissage=SELECTED_COLORS[i+1])
-            fltk.texte(BASE_BAR_X+10, bar_y, str(current_scores[i]), ancrage="nw", police="Cascadia Code", taille=25)
-            if current_scores[i] == max_score and max_score != 0:
-                fltk.texte(BASE_BAR_X+MAX_BAR_WIDTH-60, bar_y, "👑", couleur="#FFAF4D", ancrage="nw", police="Cascadia Code", taille=25) # add a crown for the leading player
-
-    fltk.texte(GRID+(PADDING+SIDE)/2, 400, chaine="Manches gagnées", ancrage="center", police="Cascadia Code", taille=25) # display the total score
+            bar_y = base_y + (BAR_HEIGHT + BAR_VERTICAL_SPACING) * i # calculate the y coordinate of the bar
+            items = (
+                fltk.rectangle(BASE_BAR_X, bar_y, BASE_BAR_X + 40, bar_y + BAR_HEIGHT, epaisseur=5),
+                fltk.texte(BASE_BAR_X+10, bar_y, "", ancrage="nw", police="Cascadia Code", taille=25),
+                fltk.texte(BASE_BAR_X+MAX_BAR_WIDTH-60, bar_y, "👑", couleur="#FFAF4D", ancrage="nw", police="Cascadia Code", taille=25) # crown for the leading player
+            )
+            for item in items:
+                addons.modifie(item, visible=False)
+            BOARD_ITEMS[name].append(items)
+
+
+def update_item(item: int, coins: tuple[float, float, float, float] | None = None, **options) -> None:
+    """Modify an item of the game screen, only if it changed since it was last drawn
+
+    :param item: the id of the item
+    :param coins: the new corners of the item, see `fltk_addons.deplace_coins`
+    :param options: the new options of the item, see `fltk_addons.modifie`"""
+    if DRAWN.get(item) == (coins, options):
+        return
+    if coins is not None:
+        addons.deplace_coins(item, *coins)
+    addons.modifie(item, **options)
+    DRAWN[item] = (coins, options)
+
+
+def update_bars(bars: list[tuple[int, int, int]], values: list[int], base_y: int) -> None:
+    """Update a column of 4 score bars
+
+    :param bars: the items of each bar, see `create_board`
+    :param values: the value of each bar
+    :param base_y: the y coordinate of the first bar"""
+    max_value = max(*values, 1)
+    for i, (bar, text, crown) in enumerate(bars):
+        bar_y = base_y + (BAR_HEIGHT + BAR_VERTICAL_SPACING) * i # calculate the y coordinate of the bar
+        bar_width = max((values[i] / max_value)*MAX_BAR_WIDTH, 40) # calculate the width of the bar
+        update_item(bar, (BASE_BAR_X, bar_y, BASE_BAR_X + bar_width, bar_y + BAR_HEIGHT), remplissage=SELECTED_COLORS[i+1], visible=True)
+        update_item(text, chaine=str(values[i]), visible=True)
+        update_item(crown, visible=values[i] == max(values) and values[i] != 0)
+
+
+def display_grid(state: GameState, player: int, current_round: int, scores: list[list[int]] | None = None) -> None:
+    """Display the game grid onto the fltk window and side informations
+
+    The items are drawn once by `create_board`, or again after the canvas was
+    cleared, then only the ones whose color or text changed are modified.
+    Only the cells reported by `GameState.take_changes` are recolored, unless
+    the state or the theme differs from the last call.
+    
+    :param state: the state of the round
+    :param player: the current player
+    :param current_round: the current round
+    :param scores: scores of the players by round"""
+    if not BOARD_ITEMS or not addons.existe(BOARD_ITEMS["outline"]):
+        create_board()
+    update_item(BOARD_ITEMS["outline"], couleur=SELECTED_COLORS[player])
+    if BOARD_ITEMS.get("state") is not state or BOARD_ITEMS.get("colors") is not SELECTED_COLORS:
+        # new round, recalled save, theme change or new board: every cell is recolored
+        BOARD_ITEMS["state"], BOARD_ITEMS["colors"] = state, SELECTED_COLORS
+        state.take_changes() # starts tracking the changes of this state
+        cells = [(i_elem, i_row) for i_row in range(HEIGHT) for i_elem in range(WIDTH)]
+    else:
+        cells = state.take_changes()
+    for i_elem, i_row in cells:
+        # for each changed element of the game grid, color the circle accordingly
+        cell = state.get(i_elem, i_row)
+        if cell == CLEAR and not state.is_legal(i_elem, i_row): # If slot is unused and unreachable, fill in gray
+            fill = "#393E46"
+        else: # Else, look in color lookup table
+            fill = SELECTED_COLORS[cell]
+        update_item(BOARD_ITEMS["cells"][i_row*WIDTH + i_elem], couleur=fill, remplissage=fill)
+
+    if scores[current_round]:
+        update_bars(BOARD_ITEMS["score_bars"], scores[current_round], BASE_BAR_Y)
     if scores:
         rounds_won = [sum(scores[round_id][player_id] == max(scores[round_id]) for round_id in range(current_round)) for player_id in range(4)]
-        for i in range(4):
-            bar_y = 450 + (BAR_HEIGHT + BAR_VERTICAL_SPACING) * i # calculate the y coordinate of the bar
-            bar_width = max((rounds_won[i] / max(*rounds_won, 1))*MAX_BAR_WIDTH, 40) # calculate the width of the bar
-            fltk.rectangle(BASE_BAR_X, bar_y, BASE_BAR_X + bar_width, bar_y + BAR_HEIGHT, epaisseur=5, remplissage=SELECTED_COLORS[i+1])
-            fltk.texte(BASE_BAR_X+10, bar_y, str(rounds_won[i]), ancrage="nw", police="Cascadia Code", taille=25)
-            if rounds_won[i] == max(rounds_won) and rounds_won[i] != 0:
-                fltk.texte(BASE_BAR_X+MAX_BAR_WIDTH-60, bar_y, "👑", couleur="#FFAF4D", ancrage="nw", police="Cascadia Code", taille=25) # add a crown for the leading player
+        update_bars(BOARD_ITEMS["round_bars"], rounds_won, 450)
 
 def display_end_window(scores: list[int], text: str) -> None:
     """Display the end window with the final scores
@@ -190,11 +247,8 @@ def display_end_window(scores: list[int], text: str) -> None:
 
     fltk.texte(GRID+(PADDING+SIDE)/2, 50, chaine=text, couleur="black", ancrage="n", police="Cascadia Code", taille=25)
 
-    ev = None
     while True:
-        fltk.mise_a_jour()
-        ev = fltk.donne_ev()
-        if ev is None: continue
+        ev = addons.attend_ev() # sleeps until the next event
         if ev[0] == "ClicGauche":
             return
         elif ev[0] == "Quitte":
@@ -222,18 +276,15 @@ def menu_window_select(texts: tuple[str, str, str, str]) -> int:
     fltk.texte(GRID+(PADDING+SIDE)/2, 400, chaine="A vos boules !", couleur="black", ancrage="center", police="Cascadia Code", taille=25)
 
     if len(saves) > 0:
-        date = ctime(os.path.getmtime(saves[0])).split() #Get latest date and convert from Unix to readable - [1] to take the date and not the true/false return, 0 to take the soonest file
+        date = format_date(catalogue.get(saves[0])[1]) # the saves are sorted from the most recent
         fltk.rectangle(GRID+PADDING, GRID-160, GRID+SIDE, GRID-70, epaisseur=5, remplissage="#F0F0F0", tag="recall")
         fltk.texte(GRID+(PADDING+SIDE)/2, 700, "Reprendre", ancrage="center", police="Cascadia Code", taille=30, tag="recall")
-        fltk.texte(GRID+(PADDING+SIDE)/2, 735, (date[2]+"/"+str(MONTHS[date[1]])+" "+date[3]), ancrage="center", police="Cascadia Code", taille=12, tag="recall")
+        fltk.texte(GRID+(PADDING+SIDE)/2, 735, date, ancrage="center", police="Cascadia Code", taille=12, tag="recall")
         fltk.rectangle(GRID+(PADDING+SIDE)/2-100, 780, GRID+(PADDING+SIDE)/2+100, 810, epaisseur=3, remplissage="#F0F0F0", tag="select-save")
         fltk.texte(GRID+(PADDING+SIDE)/2, 795, "Choisir sauvegarde", ancrage="center", police="Cascadia Code", taille=12, tag="select-save")
 
-    ev = None
     while True:
-        fltk.mise_a_jour()
-        ev = fltk.donne_ev()
-        if ev is None: continue
+        ev = addons.attend_ev() # sleeps until the next event
         if ev[0] == "ClicGauche":
             if ev[1].x <= 830:
                 if ev[1].x <= 415 and ev[1].y <= 415:
@@ -323,44 +374,123 @@ def settings_menu() -> tuple[str, int]:
 
     fltk.texte(10, 130, chaine=RULES, ancrage="nw", police="Cascadia Code", taille=14)
     draw_save_btns() # save btns
-    # back button
+    # back button, circled when hovered
+    hover = fltk.cercle(GRID+SIDE-40/2-10, GRID-40/2-38, 38, couleur="black", epaisseur=2)
     fltk.texte(GRID+SIDE-40/2-10, GRID-40/2-10, "🔙", ancrage="s", police="Cascadia Code", taille=40, tag="back")
+    addons.affiche_au_survol("back", hover)
 
     while True:
-        ev = fltk.donne_ev()
-        if addons.est_objet_survole("back"):
-            fltk.cercle(GRID+SIDE-40/2-10, GRID-40/2-38, 38, couleur="black", epaisseur=2, tag="hover-back")
-        else:
-            fltk.efface("hover-back")
-
-        if ev != None:
-            match ev[0]:
-                case "Quitte":
-                    return ("quit", -1)
-                case "Touche":
-                    if ev[1].keysym == "Escape":
-                        return ("back", None)
-                case "ClicGauche":
-                    for i in range(len(theme_boxes)):
-                        if addons.est_objet_survole(theme_boxes[i]):
-                            return ("theme", i)
-                    if addons.est_objet_survole("save"):
-                        return ("save", None)
-                    if addons.est_objet_survole("recall"):
-                        return ("recall", None)
-                    if addons.est_objet_survole("back"):
-                        return ("back", None)
-            ev = fltk.donne_ev()
-        fltk.mise_a_jour()
-
-
-def mainloop(nb_players: int, nb_rounds: int, ai: bool) -> None:
+        ev = addons.attend_ev() # sleeps until the next event
+        match ev[0]:
+            case "Quitte":
+                return ("quit", -1)
+            case "Touche":
+                if ev[1].keysym == "Escape":
+                    return ("back", None)
+            case "ClicGauche":
+                for i in range(len(theme_boxes)):
+                    if addons.est_objet_survole(theme_boxes[i]):
+                        return ("theme", i)
+                if addons.est_objet_survole("save"):
+                    return ("save", None)
+                if addons.est_objet_survole("recall"):
+                    return ("recall", None)
+                if addons.est_objet_survole("back"):
+                    return ("back", None)
+
+
+class AIPlayer:
+    """Plays the AI turns without blocking the window.
+
+    After the delay, the move is computed in a daemon thread and the window
+    checks for it with Tk `after` callbacks, since Tk must only be used from
+    the main thread. The move is then played and `fltk_addons.attend_ev` is
+    woken up so the main loop redraws the board. Cancelling drops the pending
+    callback and changes the generation, so the result of a running thread is
+    ignored. A search can't be interrupted, but they all have a time limit:
+    the next one waits for it to end, since they share the tables of
+    `modules.ai` and the trees of `modules.mcts`."""
+    __slots__ = ("delay", "task", "thread", "generation")
+
+    def __init__(self, delay: float = AI_DELAY) -> None:
+        self.delay = delay
+        self.task = None # id of the pending after callback, None when no AI turn is in progress
+        self.thread = None # the last search started
+        self.generation = 0 # incremented by each cancellation, the results of older generations are ignored
+
+    @property
+    def pending(self) -> bool:
+        """Whether an AI move is being waited for or computed"""
+        return self.task is not None
+
+    def start(self, state: GameState) -> None:
+        """Play the move of the AI to move after the delay
+
+        :param state: the state of the round, the move is played on it"""
+        self.task = addons.programme(self.delay, self.compute, state)
+
+    def compute(self, state: GameState) -> None:
+        """Start computing the move in a thread, on a copy of the grid
+
+        :param state: the state of the round"""
+        if self.thread is not None and self.thread.is_alive(): # a cancelled search is still running
+            self.task = addons.programme(AI_POLL, self.compute, state)
+            return
+        grid, player, seats = state.to_grid(), state.player(), list(state.seats)
+        result = []
+        self.thread = threading.Thread(target=think, args=(grid, player, seats, result), daemon=True)
+        self.thread.start()
+        self.task = addons.programme(AI_POLL, self.finish, state, result, self.generation)
+
+    def finish(self, state: GameState, result: list, generation: int) -> None:
+        """Play the move once the thread found it
+
+        :param state: the state of the round
+        :param result: the list the thread appends the move or its error to
+        :param generation: the generation of the search"""
+        if generation != self.generation: # cancelled
+            return
+        if not result: # still thinking
+            self.task = addons.programme(AI_POLL, self.finish, state, result, generation)
+            return
+        self.task = None
+        move = result[0]
+        if isinstance(move, Exception):
+            print(f"Erreur de l'IA : {move!r}, coup glouton joué à la place")
+            move = ai_move(state.to_grid(), state.player(), "greedy", list(state.seats), 0, None)
+        state.apply(move)
+        addons.reveille()
+
+    def cancel(self) -> None:
+        """Cancel the AI turn in progress, if any"""
+        if self.task is not None:
+            addons.annule(self.task)
+            self.task = None
+        self.generation += 1
+
+
+def think(grid: list[list[int]], player: int, seats: list[int], result: list) -> None:
+    """Compute the move of the AI (in a thread)
+
+    :param grid: a copy of the game grid
+    :param player: the color of the AI
+    :param seats: the colors in playing order
+    :param result: the list to append the move to, or the error raised by the AI"""
+    try:
+        result.append(ai_move(grid, player, AI_STRATEGY, seats, ENDGAME_EMPTIES))
+    except Exception as error: # reported by AIPlayer.finish, the window must not wait forever
+        result.append(error)
+
+
+def mainloop(nb_players: int, nb_rounds: int, ai: bool, ai_delay: float = AI_DELAY) -> None:
     """Main game loop
 
     :param nb_players: number of players
     :param nb_rounds: number of rounds
-    :param ai: if the player wants to play against the AI"""
+    :param ai: if the player wants to play against the AI
+    :param ai_delay: delay before each AI move, in seconds"""
     global ALL_COLORS, COLOR_INDEX, SELECTED_COLORS, saves
+    catalogue.sync("saves") # catch up with the saves added or deleted while the game was closed
     saves = saves_list()
     # create the game window
     fltk.cree_fenetre(GRID+PADDING+SIDE, GRID, 60, False)
@@ -419,37 +549,39 @@ def mainloop(nb_players: int, nb_rounds: int, ai: bool) -> None:
         
     scores = [[None] * 4 for _ in range(nb_rounds)]
     
-    if skip:
-        gameState = saver.recall(saves[0])
-        grid, player_bias, tour, nb_players, nb_ai, nb_rounds, round_i, scores, COLOR_INDEX = gameState
-        SELECTED_COLORS = ALL_COLORS[COLOR_INDEX]
-
-    if select_save:
-        gameState = saver.recall(choice)
-        grid, player_bias, tour, nb_players, nb_ai, nb_rounds, round_i, scores, COLOR_INDEX = gameState
+    if skip or select_save:
+        try:
+            state, nb_ai, nb_rounds, round_i, scores, COLOR_INDEX = saver.recall(saves[0] if skip else choice)
+        except (saver.SaveError, OSError) as error:
+            print(f"Sauvegarde illisible : {error}")
+            if isinstance(error, FileNotFoundError): # removed since the catalogue listed it
+                catalogue.forget(error.filename)
+            fltk.ferme_fenetre()
+            return
+        nb_players = len(state.seats) - nb_ai
         SELECTED_COLORS = ALL_COLORS[COLOR_INDEX]
 
+    ai_player = AIPlayer(ai_delay)
     while round_i < nb_rounds:
         if not skip and not select_save:
-            player_bias = randint(0, 4)
-            grid = init_grid()
-            tour = 0
-        skip = False
-        while tour < 60:
-            # simple formula to get player index based on the number of players and the index of the turn
-            player = (tour + player_bias) % (nb_players + nb_ai) + 1
-            player = TURNS[nb_players + nb_ai][player - 1]
-            scores[round_i] = calc_score(grid)
-            display_grid(grid, player, round_i, scores)
-            # loop over events
-            ev = fltk.donne_ev()
-            if addons.est_objet_survole("settings-icon"):
-                fltk.cercle(GRID+SIDE-40/2-20, GRID-40/2-10-32, 32, couleur="black", epaisseur=2)
+            # the state keeps the turn, the seats and the scores up to date while playing
+            state = GameState(None, TURNS[nb_players + nb_ai], randint(0, nb_players + nb_ai - 1))
+        skip = select_save = False
+        while state.turn < 60:
+            player = state.player()
+            scores[round_i] = state.score()
+            display_grid(state, player, round_i, scores)
+            # the last seats are the AIs, they play in the background
+            if state.turn % (nb_players + nb_ai) >= nb_players and not ai_player.pending:
+                ai_player.start(state)
+            # sleep until an event arrives or an AI played, then handle the events queued
+            ev = addons.attend_ev(reveil=True)
 
             while ev != None:
                 match ev[0]:
                     case "Quitte":
                         # Pretty straightforward
+                        ai_player.cancel()
                         fltk.ferme_fenetre()
                         return
                     case "ClicGauche":
@@ -457,29 +589,13 @@ def mainloop(nb_players: int, nb_rounds: int, ai: bool) -> None:
                         i_column = (ev[1].x - 15) // 100
                         i_row = (ev[1].y - 15) // 100
 
-                        # if nothing's there, set the ball and advance to the next turn
-                        if 0 <= i_column <= 7 and 0 <= i_row <= 7 and play(grid, i_column, i_row, player):
-                            tour += 1
-                            if ai and (tour % (nb_players + nb_ai)) == nb_players:
-                                # display player move, update the window and wait before making the IAs play
-                                scores[round_i] = calc_score(grid)
-                                display_grid(grid, player, round_i, scores)
-                                fltk.mise_a_jour()
-                                sleep(1)
-                                for _ in range(nb_ai):
-                                    # get current IA player id
-                                    player = (tour + player_bias) % (nb_players + nb_ai) + 1
-                                    player = TURNS[nb_players + nb_ai][player - 1]
-                                    # make them play
-                                    ai_play(grid, player)
-                                    tour += 1
-                                    # between each IA turn, display and wait
-                                    scores[round_i] = calc_score(grid)
-                                    display_grid(grid, player, round_i, scores)
-                                    fltk.mise_a_jour()
-                                    fltk.__canevas.ev_queue.clear()
-                                    sleep(1)
+                        # if nothing's there and a human is to play, set the ball and advance to the next turn
+                        if 0 <= i_column <= 7 and 0 <= i_row <= 7:
+                            if state.turn % (nb_players + nb_ai) < nb_players:
+                                state.apply((i_column, i_row))
                         elif addons.est_objet_survole("settings-icon"):
+                            # the AI turn is started again once back to the board
+                            ai_player.cancel()
                             draw_save_btns()
                             param_out = settings_menu()
                             match param_out[0]:
@@ -500,7 +616,7 @@ def mainloop(nb_players: int, nb_rounds: int, ai: bool) -> None:
                                         fltk.ferme_fenetre()
                                         return
                                     else:
-                                        saver.save("saves/"+savename+".save", grid, player_bias, nb_players, nb_ai, nb_rounds, round_i, scores, COLOR_INDEX)
+                                        saver.save(os.path.join("saves", savename + ".save"), state, nb_ai, nb_rounds, round_i, scores, COLOR_INDEX)
                                         saves = saves_list()
                                 case "recall":
                                     saves = saves_list() # Mise à jour des saves du dossier
@@ -510,9 +626,15 @@ def mainloop(nb_players: int, nb_rounds: int, ai: bool) -> None:
                                     elif save == -1:
                                         fltk.ferme_fenetre()
                                         return
+                                    try:
+                                        recalled = saver.recall(save)
+                                    except (saver.SaveError, OSError) as error: # keep playing the current game
+                                        print(f"Sauvegarde illisible : {error}")
+                                        if isinstance(error, FileNotFoundError): # removed since the catalogue listed it
+                                            catalogue.forget(error.filename)
                                     else:
-                                        gameState = saver.recall(save)
-                                        grid, player_bias, tour, nb_players, nb_ai, nb_rounds, round_i, scores, COLOR_INDEX = gameState
+                                        state, nb_ai, nb_rounds, round_i, scores, COLOR_INDEX = recalled
+                                        nb_players = len(state.seats) - nb_ai
                                         SELECTED_COLORS = ALL_COLORS[COLOR_INDEX]
 
                     case "Touche":
@@ -521,11 +643,9 @@ def mainloop(nb_players: int, nb_rounds: int, ai: bool) -> None:
 
                 # grab next event
                 ev = fltk.donne_ev()
-            # update the window after event handling
-            fltk.mise_a_jour()
 
-        # after the game has ended, calculate the score and print it
-        scores[round_i] = calc_score(grid)
+        # after the game has ended, grab the score and print it
+        scores[round_i] = state.score()
 
         if display_end_window(scores[round_i], "Score de fin\nde manche") == -1:
             fltk.ferme_fenetre()
@@ -538,22 +658,20 @@ def mainloop(nb_players: int, nb_rounds: int, ai: bool) -> None:
         display_end_window(scores_finaux, "Fin de partie\nScore final")
 
 
-def saves_list() -> tuple[bool, list[str]]:
-    """Returns the list of all save files name
+def saves_list() -> list[str]:
+    """Returns the list of all save files name, from the catalogue
     
-    :return: The list of saves"""
-    list = os.listdir("saves/")
-    saves = []
+    :return: The list of saves, the most recent first"""
+    return catalogue.saves("saves")
 
-    for el in list:
-        if el.endswith("save"):
-            saves.append(f"saves/{el}")
 
-    if saves != []:
-        saves.sort(reverse=True, key = lambda x: os.path.getmtime(x))
-        return saves
-    
-    return []
+def format_date(mtime: float) -> str:
+    """Format the modification time of a save as day/month hh:mm:ss
+
+    :param mtime: the modification time, in seconds since the epoch
+    :return: the formatted date"""
+    date = localtime(mtime)
+    return f"{date.tm_mday}/{date.tm_mon} {date.tm_hour:02}:{date.tm_min:02}:{date.tm_sec:02}"
 
 
 def name_input(x: int, y: int, anchor: str) -> str:
@@ -567,7 +685,7 @@ def name_input(x: int, y: int, anchor: str) -> str:
 
     fltk.efface("input")
     while not confirm:
-        evName, event = fltk.attend_ev() #Get event
+        evName, event = addons.attend_ev() #Get event
         match evName:
             case "Touche":
                 key = event.keysym
@@ -610,14 +728,14 @@ def save_menu(saves: list[str], xsaves: list[str] | None = None) -> str:
         xsaves = saves
 
     for i in range(min(len(xsaves), 5)): # On affiche uniquement les 5 premiers résultats (len(xsaves) si < 5 sinon 5)
-        date = ctime(os.path.getmtime(xsaves[i])).split()
+        date = format_date(catalogue.get(xsaves[i])[1])
         fltk.rectangle(3*(GRID+SIDE)/14, (6+3/2*i)*GRID/14, 11*(GRID+SIDE)/14, (7+3/2*i)*GRID/14, couleur="black", epaisseur=3, tag=xsaves[i])
-        fltk.texte((GRID+SIDE)/2, (6+3/2*i)*GRID/14+30, (xsaves[i])[:-5]+" - "+(date[2]+"/"+str(MONTHS[date[1]])+" "+date[3]), ancrage="center", tag=xsaves[i])
+        fltk.texte((GRID+SIDE)/2, (6+3/2*i)*GRID/14+30, (xsaves[i])[:-5]+" - "+date, ancrage="center", tag=xsaves[i])
         fltk.texte(5*(GRID+SIDE)/6, (6+3/2*i)*GRID/14+10, "🗑️", tag=xsaves[i]+"bin")
         fltk.mise_a_jour()
 
     while not confirm:
-        evName, event = fltk.attend_ev() #Get event
+        evName, event = addons.attend_ev() #Get event
         match evName:
             case "ClicGauche":
                 survol = addons.objet_survole()
@@ -628,10 +746,10 @@ def save_menu(saves: list[str], xsaves: list[str] | None = None) -> str:
                         return cible
                     #Si le survol finit par bin, on supprime le fichier et // on réactualise la liste
                     if cible[-3:] == "bin":
-                        os.remove(cible[:-3])
-                        xsaves = xsaves.remove(cible[:-3])
-                        newsave = save_menu(saves, xsaves)
+                        saver.delete(cible[:-3])
+                        xsaves.remove(cible[:-3])
                         saves = saves_list() # Mise à jour des saves dans le dossier
+                        newsave = save_menu(saves, xsaves)
                         return newsave
 
                     if cible == "box-input":
@@ -643,8 +761,9 @@ def save_menu(saves: list[str], xsaves: list[str] | None = None) -> str:
                         if search == -1:
                             return -1
                         elif search != -2:
-                            #On crée une liste secondaire ne contenant que les saves contenant l'input
-                            xsaves = [el for el in xsaves if search in el[:-5]]
+                            #On crée une liste secondaire ne contenant que les saves contenant l'input, trouvées par le catalogue
+                            current = set(xsaves)
+                            xsaves = [el for el in catalogue.search("saves", search) if el in current]
                             #On imbrique la fonction
                         newsave = save_menu(saves, xsaves)
                         return newsave
@@ -0,0 +1,171 @@
+"""Monte-Carlo Tree Search AI for the Rolit game"""
+
+from math import log, sqrt
+from random import choice, shuffle
+from time import perf_counter
+from modules.rolit import *
+
+DEFAULT_ITERATIONS = None # no iteration limit by default, only the time budget
+DEFAULT_TIME_BUDGET = 1.0 # seconds allowed per move
+EXPLORATION = 1.4 # UCT exploration constant
+
+
+class Node:
+    """Position in the search tree"""
+    __slots__ = ("move", "player", "to_move", "key", "parent", "children", "untried", "visits", "rewards")
+
+    def __init__(self, board: BitBoard, to_move: int, move: tuple[int, int] | None = None, player: int | None = None, parent: "Node | None" = None) -> None:
+        self.move = move # move leading to this node
+        self.player = player # color that played it
+        self.to_move = to_move
+        self.key = board.key ^ SIDE_KEYS[to_move]
+        self.parent = parent
+        self.children = []
+        self.untried = mask_to_cells(board.frontier)
+        shuffle(self.untried)
+        self.visits = 0
+        self.rewards = [0.0, 0.0, 0.0, 0.0] # summed rewards, in the order RED, YELLOW, GREEN, BLUE
+
+    def select(self, exploration: float) -> "Node":
+        """Pick the child with the best UCT value for the color to move
+
+        :param exploration: the exploration constant
+        :return: the selected child"""
+        log_visits = log(self.visits)
+        index = self.to_move - 1
+        return max(self.children, key=lambda child: child.rewards[index] / child.visits + exploration * sqrt(log_visits / child.visits))
+
+
+def playout(board: BitBoard, color: int, players: tuple[int, ...]) -> list[float]:
+    """Play random moves until the end of the round
+
+    :param board: the game board, modified in place
+    :param color: the color to move
+    :param players: the colors in playing order
+    :return: the reward of each color, in the order RED, YELLOW, GREEN, BLUE"""
+    while board.frontier:
+        x, y = choice(mask_to_cells(board.frontier))
+        board.play(x, y, color)
+        color = next_player(players, color)
+    scores = board.score()
+    best = max(scores[player - 1] for player in players)
+    winners = [player for player in players if scores[player - 1] == best]
+    # winners share the point of the round
+    rewards = [0.0, 0.0, 0.0, 0.0]
+    for player in winners:
+        rewards[player - 1] = 1 / len(winners)
+    return rewards
+
+
+class MCTS:
+    """UCT search tree of one AI, kept between its turns"""
+
+    def __init__(self, color: int, players: tuple[int, ...], exploration: float = EXPLORATION) -> None:
+        self.color = color
+        self.players = tuple(players)
+        self.exploration = exploration
+        self.root = None
+        self.playouts = 0 # total amount of playouts and time spent, to measure the throughput
+        self.elapsed = 0.0
+        self.reused = 0 # amount of searches that started from a previous subtree
+
+    def find_root(self, board: BitBoard) -> Node:
+        """Get the node of the current position, reusing the previous tree if it contains it
+
+        :param board: the current position
+        :return: the root node for the search"""
+        key = board.key ^ SIDE_KEYS[self.color]
+        if self.root is not None:
+            # the other players moved since our last turn, so the position is a few plies below the old root
+            level = [self.root]
+            for _ in range(len(self.players) + 1):
+                for node in level:
+                    if node.key == key and node.to_move == self.color:
+                        node.parent = None
+                        self.reused += 1
+                        return node
+                level = [child for node in level for child in node.children]
+        return Node(board, self.color)
+
+    def iterate(self, board: BitBoard) -> None:
+        """Run one selection, expansion, playout and backpropagation
+
+        :param board: a copy of the root position, modified in place"""
+        node = self.root
+        # selection
+        while not node.untried and node.children:
+            node = node.select(self.exploration)
+            board.play(node.move[0], node.move[1], node.player)
+        # expansion
+        if node.untried:
+            move = node.untried.pop()
+            board.play(move[0], move[1], node.to_move)
+            child = Node(board, next_player(self.players, node.to_move), move, node.to_move, node)
+            node.children.append(child)
+            node = child
+        # playout
+        rewards = playout(board, node.to_move, self.players)
+        self.playouts += 1
+        # backpropagation
+        while node is not None:
+            node.visits += 1
+            for i in range(4):
+                node.rewards[i] += rewards[i]
+            node = node.parent
+
+    def search(self, grid: list[list[int]], iterations: int | None = DEFAULT_ITERATIONS, time_budget: float | None = DEFAULT_TIME_BUDGET) -> tuple[int, int]:
+        """Search the position until the iteration or time budget is spent
+
+        :param grid: the game grid
+        :param iterations: the maximum amount of iterations, None for no limit
+        :param time_budget: the time allowed, in seconds, None for no limit
+        :return: the most visited move"""
+        board = grid if isinstance(grid, BitBoard) else BitBoard.from_grid(grid)
+        self.root = self.find_root(board)
+        start = perf_counter()
+        deadline = None if time_budget is None else start + time_budget
+        done = 0
+        while (iterations is None or done < iterations) and (deadline is None or perf_counter() < deadline):
+            self.iterate(board.copy())
+            done += 1
+            # at least one limit is needed, default to a single iteration
+            if iterations is None and deadline is None:
+                break
+        self.elapsed += perf_counter() - start
+        if not self.root.children:
+            return choice(mask_to_cells(board.frontier))
+        return max(self.root.children, key=lambda child: child.visits).move
+
+    def playouts_per_second(self) -> float:
+        """Get the measured playout throughput"""
+        return self.playouts / self.elapsed if self.elapsed else 0.0
+
+
+TREES = {} # search trees kept between the moves of each AI, by (color, players)
+
+
+def get_tree(color: int, players: tuple[int, ...]) -> MCTS:
+    """Get the search tree of an AI, creating it if needed
+
+    :param color: the color of the AI
+    :param players: the colors in playing order
+    :return: the search tree"""
+    if (color, players) not in TREES:
+        TREES[(color, players)] = MCTS(color, players)
+    return TREES[(color, players)]
+
+
+def mcts_move(grid: list[list[int]], color: int, players: tuple[int, ...], iterations: int | None = DEFAULT_ITERATIONS, time_budget: float | None = DEFAULT_TIME_BUDGET, workers: int = 1) -> tuple[int, int]:
+    """Choose a move with Monte-Carlo Tree Search
+
+    :param grid: the game grid
+    :param color: the color of the AI
+    :param players: the colors in playing order
+    :param iterations: the maximum amount of playouts, None for no limit
+    :param time_budget: the time allowed, in seconds, None for no limit
+    :param workers: the amount of processes searching in parallel
+    :return: the chosen move"""
+    if workers > 1:
+        from modules.parallel import parallel_mcts_move # imported here since modules.parallel depends on this module
+        return parallel_mcts_move(grid, color, players, workers, iterations, time_budget)
+    return get_tree(color, tuple(players)).search(grid, iterations, time_budget)
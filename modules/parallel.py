@@ -0,0 +1,240 @@
+"""Multi-process search for the Rolit AIs"""
+
+import atexit
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import Array
+from time import perf_counter
+from modules.rolit import *
+from modules.ai import DEFAULT_DEPTH, DEFAULT_TABLE_BITS, INFINITY, Search, SearchTimeout, TranspositionTable, ordered_moves, search_root
+from modules.mcts import DEFAULT_ITERATIONS, DEFAULT_TIME_BUDGET, MCTS
+
+_pool = None # worker processes, started on first use and kept between moves
+_pool_size = 0
+_bounds = None # best alpha-beta value found at each depth by the workers of the current search, shared with them
+
+
+def init_worker(bounds) -> None:
+    """Keep the shared bounds in a worker process, at its start
+
+    :param bounds: the shared array of the best values by depth"""
+    global _bounds
+    _bounds = bounds
+
+
+def get_pool(workers: int) -> ProcessPoolExecutor:
+    """Get a pool of at least workers processes, restarting it if it is too small
+
+    :param workers: the amount of processes
+    :return: the process pool"""
+    global _pool, _pool_size, _bounds
+    if _pool is None or _pool_size < workers:
+        shutdown()
+        _bounds = Array("i", WIDTH * HEIGHT + 1)
+        _pool = ProcessPoolExecutor(workers, initializer=init_worker, initargs=(_bounds,))
+        _pool_size = workers
+    return _pool
+
+
+def shutdown() -> None:
+    """Stop the worker processes"""
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(cancel_futures=True)
+        _pool = None
+
+
+atexit.register(shutdown)
+
+
+def default_workers() -> int:
+    """Get the amount of CPU cores available"""
+    return os.cpu_count() or 1
+
+
+def mcts_worker(masks: list[int], color: int, players: tuple[int, ...], iterations: int | None, time_budget: float | None, seed: int) -> tuple[dict[tuple[int, int], int], int]:
+    """Run an independent MCTS from the root position (in a worker process)
+
+    :param masks: the masks of the root bitboard
+    :param color: the color of the AI
+    :param players: the colors in playing order
+    :param iterations: the maximum amount of playouts of this worker
+    :param time_budget: the time allowed, in seconds
+    :param seed: the random seed of this worker, so that workers explore differently
+    :return: the visit count of each root move and the amount of playouts"""
+    random.seed(seed)
+    tree = MCTS(color, players)
+    tree.search(BitBoard(masks), iterations, time_budget)
+    return {child.move: child.visits for child in tree.root.children}, tree.playouts
+
+
+def alphabeta_worker(masks: list[int], color: int, players: tuple[int, ...], root_moves: list[tuple[int, int]], depth: int, time_budget: float) -> tuple[list[tuple[tuple[int, int], int]], int]:
+    """Run iterative deepening on a share of the root moves (in a worker process)
+
+    :param masks: the masks of the root bitboard
+    :param color: the color of the AI
+    :param players: the colors in playing order
+    :param root_moves: the root moves searched by this worker
+    :param depth: the maximum depth
+    :param time_budget: the time allowed, in seconds
+    :return: the best move and value found at each completed depth, and the amount of nodes visited"""
+    board = BitBoard(masks)
+    search = Search(color, players, perf_counter() + time_budget, TranspositionTable(DEFAULT_TABLE_BITS - 2))
+    results, best_move = [], None
+    for current in range(1, depth + 1):
+        try:
+            best_move, value = search_root(board, current, search, "paranoid", best_move, root_moves, _bounds)
+        except SearchTimeout:
+            break
+        results.append((best_move, value))
+        if current >= WIDTH * HEIGHT - board.occupied().bit_count():
+            break
+    return results, search.nodes
+
+
+def run_mcts(grid: list[list[int]], color: int, players: tuple[int, ...], workers: int, iterations: int | None = DEFAULT_ITERATIONS, time_budget: float | None = DEFAULT_TIME_BUDGET) -> tuple[tuple[int, int], int]:
+    """Root parallel MCTS: every worker grows its own tree and the root visit counts are summed
+
+    :param grid: the game grid
+    :param color: the color of the AI
+    :param players: the colors in playing order
+    :param workers: the amount of processes
+    :param iterations: the total amount of playouts, None for no limit
+    :param time_budget: the time allowed, in seconds, None for no limit
+    :return: the most visited move and the total amount of playouts"""
+    board = grid if isinstance(grid, BitBoard) else BitBoard.from_grid(grid)
+    share = None if iterations is None else -(-iterations // workers)
+    futures = [
+        get_pool(workers).submit(mcts_worker, board.masks, color, tuple(players), share, time_budget, random.getrandbits(32))
+        for _ in range(workers)
+    ]
+    visits, playouts = {}, 0
+    for future in futures:
+        worker_visits, worker_playouts = future.result()
+        playouts += worker_playouts
+        for move, count in worker_visits.items():
+            visits[move] = visits.get(move, 0) + count
+    if not visits:
+        return random.choice(mask_to_cells(board.frontier)), playouts
+    return max(visits, key=visits.get), playouts
+
+
+def run_alphabeta(grid: list[list[int]], color: int, players: tuple[int, ...], workers: int, depth: int = DEFAULT_DEPTH, time_budget: float = DEFAULT_TIME_BUDGET) -> tuple[tuple[int, int], int, int, int]:
+    """Root splitting alpha-beta: the root moves are dealt between the workers
+
+    Workers may not all reach the same depth, so the results are compared
+    at the deepest depth completed by every worker. They share the best value
+    found at each depth, so a worker only needs the exact value of the moves
+    that could beat the other workers' ones. The transposition tables stay
+    private to each process.
+
+    :param grid: the game grid
+    :param color: the color of the AI
+    :param players: the colors in playing order
+    :param workers: the amount of processes
+    :param depth: the maximum depth
+    :param time_budget: the time allowed, in seconds
+    :return: the best move, its value, the depth compared and the amount of nodes visited"""
+    board = grid if isinstance(grid, BitBoard) else BitBoard.from_grid(grid)
+    moves = ordered_moves(board, color)
+    # deal the moves like cards, so that every worker gets some of the promising ones
+    shares = [moves[i::workers] for i in range(workers) if moves[i::workers]]
+    pool = get_pool(workers)
+    with _bounds.get_lock():
+        for i in range(len(_bounds)):
+            _bounds[i] = -INFINITY
+    futures = [
+        pool.submit(alphabeta_worker, board.masks, color, tuple(players), share, depth, time_budget)
+        for share in shares
+    ]
+    results, nodes = [], 0
+    for future in futures:
+        worker_results, worker_nodes = future.result()
+        results.append(worker_results)
+        nodes += worker_nodes
+    reached = min(len(worker_results) for worker_results in results)
+    if reached == 0: # a worker couldn't finish depth 1 in time
+        return moves[0], 0, 0, nodes
+    move, value = max((worker_results[reached - 1] for worker_results in results), key=lambda result: result[1])
+    return move, value, reached, nodes
+
+
+def parallel_mcts_move(grid: list[list[int]], color: int, players: tuple[int, ...], workers: int, iterations: int | None = DEFAULT_ITERATIONS, time_budget: float | None = DEFAULT_TIME_BUDGET, **options) -> tuple[int, int]:
+    """Choose a move with root parallel MCTS
+
+    The trees live in the worker processes, so they aren't reused between turns.
+
+    :param grid: the game grid
+    :param color: the color of the AI
+    :param players: the colors in playing order
+    :param workers: the amount of processes
+    :param iterations: the total amount of playouts, None for no limit
+    :param time_budget: the time allowed, in seconds, None for no limit
+    :param options: other settings, not used by the parallel search
+    :return: the chosen move"""
+    return run_mcts(grid, color, players, workers, iterations, time_budget)[0]
+
+
+def parallel_alphabeta_move(grid: list[list[int]], color: int, players: tuple[int, ...], workers: int, depth: int = DEFAULT_DEPTH, time_budget: float = DEFAULT_TIME_BUDGET, **options) -> tuple[int, int]:
+    """Choose a move with root splitting alpha-beta
+
+    :param grid: the game grid
+    :param color: the color of the AI
+    :param players: the colors in playing order
+    :param workers: the amount of processes
+    :param depth: the maximum depth
+    :param time_budget: the time allowed, in seconds
+    :param options: other settings, not used by the parallel search
+    :return: the chosen move"""
+    return run_alphabeta(grid, color, players, workers, depth, time_budget)[0]
+
+
+def benchmark(grid: list[list[int]], color: int, players: tuple[int, ...], workers: int | None = None, time_budget: float = 2.0, depth: int = 5) -> dict[str, float]:
+    """Measure the speedup of the parallel searches against a single process
+
+    MCTS is compared on playouts per second under the same time budget,
+    alpha-beta on the time needed to search to a fixed depth.
+
+    :param grid: the game grid
+    :param color: the color of the AI
+    :param players: the colors in playing order
+    :param workers: the amount of processes, defaults to the amount of cores
+    :param time_budget: the time given to each MCTS run, in seconds
+    :param depth: the depth of the alpha-beta runs
+    :return: the speedup of each search"""
+    workers = default_workers() if workers is None else workers
+    players = tuple(players)
+    get_pool(workers) # start the processes before measuring
+    # the baseline runs in a worker too, so both sides pay the same transfer cost
+    single_playouts = run_mcts(grid, color, players, 1, None, time_budget)[1]
+    parallel_playouts = run_mcts(grid, color, players, workers, None, time_budget)[1]
+    start = perf_counter()
+    run_alphabeta(grid, color, players, 1, depth, float("inf"))
+    single_time = perf_counter() - start
+    start = perf_counter()
+    run_alphabeta(grid, color, players, workers, depth, float("inf"))
+    parallel_time = perf_counter() - start
+    return {
+        "workers": workers,
+        "mcts": parallel_playouts / max(single_playouts, 1),
+        "alphabeta": single_time / parallel_time
+    }
+
+
+def main(args) -> None:
+    """Entry point of `python main.py parallel`
+
+    :param args: the parsed command line arguments"""
+    random.seed(args.seed)
+    players = tuple(TURNS[args.players])
+    grid = init_grid()
+    # a few random moves, to measure on a position with more choices than the first one
+    for turn in range(args.moves):
+        x, y = random.choice(sorted(legal_moves(grid)))
+        play(grid, x, y, players[turn % len(players)])
+    color = players[args.moves % len(players)]
+    speedups = benchmark(grid, color, players, args.workers, args.time, args.depth)
+    print(f"{speedups['workers']} processus")
+    print(f"mcts : x{speedups['mcts']:.2f} simulations par seconde")
+    print(f"alphabeta : x{speedups['alphabeta']:.2f} plus rapide à profondeur {args.depth}")
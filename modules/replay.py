@@ -0,0 +1,74 @@
+"""Streaming replay of stored games, one position at a time
+
+The generators replay the move logs of save files and game archives through
+`rolit.play` on a single grid, so memory use doesn't depend on the amount
+of games. The yielded grid is updated in place by the next step: copy it to
+keep a position.
+"""
+
+from modules.rolit import *
+from modules.archive import stream
+import modules.saver as saver
+
+
+def replay(history: bytes, seats: list[int], bias: int = 0, plies: range | None = None, colors: set[int] | None = None):
+    """Replay a move log from the start of the round
+
+    :param history: the moves, one byte each, see `rolit.encode_move`
+    :param seats: the colors in playing order
+    :param bias: the index of the seat playing first
+    :param plies: only yield the moves whose index in the round is in this range
+    :param colors: only yield the moves of these colors
+    :return: a generator of (grid before the move, move as (x, y, color), scores after the move)
+    :raise ValueError: if a move is played out of turn or is illegal"""
+    grid = init_grid()
+    scores = list(calc_score(grid))
+    last = len(history) if plies is None else min(len(history), plies.stop)
+    for ply in range(last): # the moves after the range aren't replayed
+        x, y, color = decode_move(history[ply])
+        if color != seats[(ply + bias) % len(seats)] or grid[y][x] != CLEAR or not test_adjacent(grid, x, y):
+            raise ValueError(f"illegal move {(x, y)} for color {color} at ply {ply}")
+        captures = check_capture(grid, x, y, color)
+        # the captured balls move from their previous color to the player's
+        for x_, y_ in captures:
+            scores[grid[y_][x_] - 1] -= 1
+        scores[color - 1] += len(captures) + 1
+        if (plies is None or ply in plies) and (colors is None or color in colors):
+            yield grid, (x, y, color), tuple(scores)
+        play(grid, x, y, color)
+
+
+def replay_archive(path: str, games: range | None = None, rounds: set[int] | None = None, plies: range | None = None, colors: set[int] | None = None):
+    """Replay the games of an archive, see `modules.archive`
+
+    :param path: the path of the archive
+    :param games: only replay the games whose id is in this range
+    :param rounds: only replay these rounds of each game
+    :param plies: only yield the moves whose index in the round is in this range
+    :param colors: only yield the moves of these colors
+    :return: a generator of (grid before the move, move as (x, y, color), scores after the move)"""
+    # the games are read in file order, so no index of the games is built
+    for game_id, game in enumerate(stream(path)):
+        if games is not None:
+            if games.step > 0 and game_id >= games.stop: # no game after the range
+                break
+            if game_id not in games:
+                continue
+        for round_view in game:
+            if rounds is not None and round_view.round_i not in rounds:
+                continue
+            yield from replay(round_view.history, round_view.seats, round_view.bias, plies, colors)
+
+
+def replay_save(path: str, plies: range | None = None, colors: set[int] | None = None):
+    """Replay the current round of a save file
+
+    Version 1 saves have no move history, nothing is yielded for them.
+
+    :param path: the path of the save file
+    :param plies: only yield the moves whose index in the round is in this range
+    :param colors: only yield the moves of these colors
+    :return: a generator of (grid before the move, move as (x, y, color), scores after the move)"""
+    state = saver.recall(path)[0]
+    if state.history is not None:
+        yield from replay(state.history, state.seats, state.bias, plies, colors)
@@ -1,7 +1,6 @@
 """All the functions needed for the Rolit game are here."""
 
-from random import randint
-from copy import deepcopy
+from random import choice, randint, Random
 
 WIDTH, HEIGHT = 8, 8 # grid size
 CLEAR, RED, YELLOW, GREEN, BLUE = 0, 1, 2, 3, 4 # macros for colors
@@ -11,6 +10,47 @@ COLOR_NAMES = {
     GREEN:  "vert",
     BLUE:   "bleu"
 }
+ENDGAME_EMPTIES = 8 # the AIs solve the end of the round exactly from this amount of empty cells
+BOOK_FILE = "book.rlb" # opening book of the AIs, see modules.book
+TURNS = { # playing order of the colors, by number of players
+    1: [RED],
+    2: [RED, GREEN],
+    3: [RED, YELLOW, GREEN],
+    4: [RED, YELLOW, GREEN, BLUE]
+}
+
+
+def build_rays() -> tuple[tuple[tuple[tuple[int, int], ...], ...], ...]:
+    """Precompute the rays going out of every cell
+
+    :return: for each cell index y*WIDTH + x, the in-bounds rays in the 8
+        directions as tuples of (x, y) coordinates, nearest first. Rays
+        shorter than 2 cells are left out since they can't capture anything."""
+    rays = []
+    for y in range(HEIGHT):
+        for x in range(WIDTH):
+            cell_rays = []
+            for dx, dy in ((-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1)):
+                ray = []
+                x_, y_ = x + dx, y + dy
+                while (0 <= x_ < WIDTH) and (0 <= y_ < HEIGHT):
+                    ray.append((x_, y_))
+                    x_, y_ = x_ + dx, y_ + dy
+                if len(ray) >= 2:
+                    cell_rays.append(tuple(ray))
+            rays.append(tuple(cell_rays))
+    return tuple(rays)
+
+
+RAYS = build_rays()
+# the same rays and the neighbours of each cell as flat indices y*WIDTH + x, for the flat board of GameState
+FLAT_RAYS = tuple(tuple(tuple(y_ * WIDTH + x_ for x_, y_ in ray) for ray in cell_rays) for cell_rays in RAYS)
+NEIGHBOURS = tuple(
+    tuple(y_ * WIDTH + x_ for y_ in range(y - 1, y + 2) for x_ in range(x - 1, x + 2)
+          if (x_, y_) != (x, y) and 0 <= x_ < WIDTH and 0 <= y_ < HEIGHT)
+    for y in range(HEIGHT) for x in range(WIDTH)
+)
+
 
 def init_grid() -> list[list[str]]:
     """Initialize the game grid
@@ -26,36 +66,34 @@ def init_grid() -> list[list[str]]:
     return grid
 
 
-def check_capture(grid: list[list[int]], x: int, y: int) -> list[tuple[int]]:
+def check_capture(grid: list[list[int]], x: int, y: int, color: int | None = None) -> list[tuple[int]]:
     """Check if a move at (x, y) for color player will capture some opponent pieces
 
+    The grid is only read, so the move can be tested before being placed.
+
     :param grid: the game grid
     :param x: the x coordinate of the move
     :param y: the y coordinate of the move
-    :param color: the color of the player
+    :param color: the color of the player, defaults to the ball at (x, y)
     :return: a list of coordinates of the captured pieces"""
-    # grab the color of the ball that was just placed
-    color = grid[y][x]
+    if color is None:
+        # grab the color of the ball that was just placed
+        color = grid[y][x]
+    if isinstance(grid, BitBoard):
+        return mask_to_cells(grid.capture_mask(x, y, color))
     captures = []
-    directions = ((-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1))
-    if x == 0: # remove directions that are out of bounds
-        directions = [d for d in directions if d[0] != -1]
-    if x == WIDTH - 1:
-        directions = [d for d in directions if d[0] != 1]
-    if y == 0:
-        directions = [d for d in directions if d[1] != -1]
-    if y == HEIGHT - 1:
-        directions = [d for d in directions if d[1] != 1]
-    for dx, dy in directions:
-        x_, y_ = x + dx, y + dy
-        capture = []
-        while (0 <= x_ < WIDTH) and (0 <= y_ < HEIGHT):
-            if grid[y_][x_] in (CLEAR, color):
+    for ray in RAYS[y * WIDTH + x]:
+        # count the opponent balls until an empty cell or one of ours
+        run = 0
+        for x_, y_ in ray:
+            cell = grid[y_][x_]
+            if cell == CLEAR:
                 break
-            capture.append((x_, y_))
-            x_, y_ = x_ + dx, y_ + dy
-        if (0 <= x_ < WIDTH) and (0 <= y_ < HEIGHT) and grid[y_][x_] == color:
-            captures.extend(capture)
+            if cell == color:
+                if run:
+                    captures.extend(ray[:run])
+                break
+            run += 1
     return captures
 
 
@@ -66,6 +104,8 @@ def test_adjacent(grid: list[list[int]], x: int, y: int) -> bool:
     :param x: the x coordinate
     :param y: the y coordinate
     :return: True if there is an adjacent piece, False otherwise"""
+    if isinstance(grid, BitBoard):
+        return bool(dilate(1 << (y * WIDTH + x)) & grid.occupied())
     # iterate over all 8 cardinal directions
     for dx in (-1, 0, 1):
         for dy in (-1, 0, 1):
@@ -91,6 +131,8 @@ def play(grid: list[list[int]], x: int, y: int, color: int) -> bool:
     :param y: the y coordinate of the move
     :param color: the color of the player
     :return: True if the move is valid, False otherwise"""
+    if isinstance(grid, BitBoard):
+        return grid.play(x, y, color)
     # invalidate placing over another ball and not adjacently to another ball
     if grid[y][x] != CLEAR or not test_adjacent(grid, x, y):
         return False
@@ -105,23 +147,137 @@ def play(grid: list[list[int]], x: int, y: int, color: int) -> bool:
     return True
 
 
-def ai_play(grid: list[list[int]], color: int) -> tuple[int, int]:
-    """Play a move for the AI
+def count_captures(grid: list[list[int]], x: int, y: int, color: int) -> int:
+    """Count the balls a move at (x, y) would capture, without playing it
 
     :param grid: the game grid
-    :param color: the color of the AI
-    :return: the move played"""
-    possible_moves = {}
+    :param x: the x coordinate of the move
+    :param y: the y coordinate of the move
+    :param color: the color of the player
+    :return: the amount of captured balls"""
+    if isinstance(grid, BitBoard):
+        return grid.capture_mask(x, y, color).bit_count()
+    return len(check_capture(grid, x, y, color))
+
+
+def make_move(grid: list[list[int]], x: int, y: int, color: int) -> list[tuple[int, int, int]] | tuple[tuple[int, ...], int, int]:
+    """Play a legal move at (x, y) in place and return what is needed to undo it
+
+    :param grid: the game grid
+    :param x: the x coordinate of the move
+    :param y: the y coordinate of the move
+    :param color: the color of the player
+    :return: the undo information to give to `unmake_move`"""
+    if isinstance(grid, BitBoard):
+        # the masks are plain ints, so remembering them is enough
+        undo = (tuple(grid.masks), grid.frontier, grid.key)
+        grid.play(x, y, color)
+        return undo
+    captures = check_capture(grid, x, y, color)
+    undo = [(x_, y_, grid[y_][x_]) for x_, y_ in captures]
+    grid[y][x] = color
+    for x_, y_ in captures:
+        grid[y_][x_] = color
+    return undo
+
+
+def unmake_move(grid: list[list[int]], x: int, y: int, undo: list[tuple[int, int, int]] | tuple[tuple[int, ...], int, int]) -> None:
+    """Undo a move played with `make_move`
+
+    :param grid: the game grid
+    :param x: the x coordinate of the move
+    :param y: the y coordinate of the move
+    :param undo: the undo information returned by `make_move`"""
+    if isinstance(grid, BitBoard):
+        grid.masks[:] = undo[0]
+        grid.frontier = undo[1]
+        grid.key = undo[2]
+        return
+    for x_, y_, previous in undo:
+        grid[y_][x_] = previous
+    grid[y][x] = CLEAR
+
+
+def legal_moves(grid: list[list[int]]) -> set[tuple[int, int]]:
+    """Get all the cells where a ball can be placed, in one pass
+
+    :param grid: the game grid
+    :return: the (x, y) coordinates of the empty cells adjacent to a ball"""
+    if isinstance(grid, BitBoard): # the bitboard keeps its frontier up to date after each move
+        return set(mask_to_cells(grid.frontier))
+    # build the mask of the occupied cells, then dilate it instead of testing each cell's neighbours
+    occupied = 0
     for i in range(HEIGHT):
+        row = grid[i]
         for j in range(WIDTH):
-            if grid[i][j] == CLEAR and test_adjacent(grid, j, i):
-                test_grid = deepcopy(grid) # copy the grid to test the move
-                test_grid[i][j] = color # play the move
-                possible_moves[(j, i)] = len(check_capture(test_grid, j, i)) # calculate the amount of captures
+            if row[j] != CLEAR:
+                occupied |= 1 << (i * WIDTH + j)
+    return set(mask_to_cells(dilate(occupied) & ~occupied))
+
+
+def next_player(players: list[int], color: int) -> int:
+    """Get the color playing after color
+
+    :param players: the colors in playing order
+    :param color: the current color
+    :return: the next color"""
+    return players[(players.index(color) + 1) % len(players)]
+
+
+def ai_move(grid: list[list[int]], color: int, strategy: str = "greedy", players: list[int] | None = None, endgame: int | None = None, book: str | None = BOOK_FILE, **options) -> tuple[int, int]:
+    """Choose a move for the AI, without playing it
+
+    :param grid: the game grid
+    :param color: the color of the AI
+    :param strategy: the name of the AI, "greedy", "random" or one of `modules.ai.STRATEGIES` ("alphabeta", "maxn", "mcts")
+    :param players: the colors in playing order, defaults to all 4 colors
+    :param endgame: solve the end of the round exactly from this amount of empty cells, 0 to never do it,
+        None for ENDGAME_EMPTIES with the search AIs and 0 with "greedy", which must stay fast
+    :param book: the opening book to play the first moves from, None to never use one
+    :param options: settings forwarded to the strategy (depth, time_budget, ...)
+    :return: the chosen move"""
+    if strategy == "random": # baseline AI, it never solves the endgame nor uses the book
+        return choice(sorted(legal_moves(grid)))
+    players = TURNS[4] if players is None else players
+    if endgame is None:
+        endgame = 0 if strategy == "greedy" else ENDGAME_EMPTIES
+    if book is not None:
+        from modules.book import book_move # imported here since modules.book depends on this module
+        move = book_move(grid, color, players, book)
+        if move is not None: # None beyond the book or in a position it doesn't know
+            return move
+    if isinstance(grid, BitBoard):
+        empties = WIDTH * HEIGHT - grid.occupied().bit_count()
+    else:
+        empties = sum(row.count(CLEAR) for row in grid)
+    if empties <= endgame:
+        from modules.ai import endgame_move # imported here since modules.ai depends on this module
+        move = endgame_move(grid, color, players)
+        if move is not None: # None when the solver ran out of time, then use the normal strategy
+            return move
+    if strategy != "greedy":
+        from modules.ai import STRATEGIES # imported here since modules.ai depends on this module
+        return STRATEGIES[strategy](grid, color, players, **options)
+    possible_moves = {}
+    for j, i in legal_moves(grid):
+        possible_moves[(j, i)] = count_captures(grid, j, i, color) # calculate the amount of captures without playing
     # get the best move(s) based on the amount of captures
     max_captures = max(possible_moves.values())
     best_moves = [k for k, v in possible_moves.items() if v == max_captures]
-    move = best_moves[randint(0, len(best_moves) - 1)]
+    return best_moves[randint(0, len(best_moves) - 1)]
+
+
+def ai_play(grid: list[list[int]], color: int, strategy: str = "greedy", players: list[int] | None = None, endgame: int | None = None, **options) -> tuple[int, int]:
+    """Play a move for the AI
+
+    :param grid: the game grid
+    :param color: the color of the AI
+    :param strategy: the name of the AI, see `ai_move`
+    :param players: the colors in playing order, defaults to all 4 colors
+    :param endgame: solve the end of the round exactly from this amount of empty cells, see `ai_move`
+    :param options: settings forwarded to the strategy
+    :return: the move played"""
+    move = ai_move(grid, color, strategy, players, endgame, **options)
     play(grid, move[0], move[1], color)
     return move
 
@@ -130,10 +286,609 @@ def calc_score(grid: list[list[int]]) -> tuple[int, int, int, int]:
     """Calculate the score for each players
 
     :return: The scores, in the order RED, YELLOW, GREEN, BLUE"""
+    if isinstance(grid, BitBoard):
+        return grid.score()
     # here we just sum up the amount of a color in each row, for each color.
     score_rouge = sum([grid[i].count(RED   ) for i in range(HEIGHT)])
     score_jaune = sum([grid[i].count(YELLOW) for i in range(HEIGHT)])
     score_vert  = sum([grid[i].count(GREEN ) for i in range(HEIGHT)])
     score_bleu  = sum([grid[i].count(BLUE  ) for i in range(HEIGHT)])
 
-    return score_rouge, score_jaune, score_vert, score_bleu
\ No newline at end of file
+    return score_rouge, score_jaune, score_vert, score_bleu
+
+
+def encode_move(x: int, y: int, color: int) -> int:
+    """Encode a move in one byte: the color in the 2 high bits, the cell index y*WIDTH + x in the 6 others
+
+    :param x: the x coordinate of the move
+    :param y: the y coordinate of the move
+    :param color: the color of the player
+    :return: the encoded move"""
+    return (color - 1) << 6 | (y * WIDTH + x)
+
+
+def decode_move(move: int) -> tuple[int, int, int]:
+    """Decode a move encoded with `encode_move`
+
+    :param move: the encoded move
+    :return: the x coordinate, the y coordinate and the color"""
+    index = move & 0b111111
+    return index % WIDTH, index // WIDTH, (move >> 6) + 1
+
+
+class GameState:
+    """State of a round: the board, the turn counter, the seats and the running scores.
+
+    The board is a flat bytearray of the 64 cells, indexed y*WIDTH + x. The
+    scores are counted once, then updated from each placement and its
+    captures, so reading them doesn't need to scan the board. Likewise
+    `frontier` is the bit mask of the legal cells (bit y*WIDTH + x), updated
+    around each placement. `pack` turns the state into 36 bytes, to keep
+    many positions in memory.
+
+    `history` logs the moves of the round with `encode_move`, it is None
+    when the state didn't start from the beginning of the round.
+
+    `changed` collects the indexes of the cells whose color or legality
+    changed since the last call to `take_changes`, so a display can only
+    redraw them. It is None until the first call: the states that are never
+    displayed don't pay for the tracking, nor do their copies."""
+    __slots__ = ("board", "turn", "seats", "bias", "scores", "history", "frontier", "changed")
+
+    def __init__(self, grid: list[list[int]] | None = None, seats: list[int] | None = None, bias: int = 0) -> None:
+        grid = init_grid() if grid is None else grid
+        self.board = bytearray(grid[y][x] for y in range(HEIGHT) for x in range(WIDTH))
+        # colors in playing order, the seat at index bias plays first
+        self.seats = tuple(TURNS[4] if seats is None else seats)
+        self.bias = bias
+        # amount of balls placed since the start of the round
+        self.turn = WIDTH * HEIGHT - 4 - self.board.count(CLEAR)
+        # scores[color - 1] is the amount of balls of that color
+        self.scores = [self.board.count(color) for color in (RED, YELLOW, GREEN, BLUE)]
+        self.history = bytearray() if self.turn == 0 else None
+        self.frontier = self.find_frontier()
+        self.changed = None
+
+    @classmethod
+    def replay(cls, history: bytes, seats: list[int], bias: int = 0) -> "GameState":
+        """Rebuild a round by playing its move history from the start
+
+        :param history: the moves, see `encode_move`
+        :param seats: the colors in playing order
+        :param bias: the index of the seat playing first
+        :return: the game state after the last move
+        :raise ValueError: if a move is played out of turn or is illegal"""
+        state = cls(None, seats, bias)
+        for move in history:
+            x, y, color = decode_move(move)
+            if color != state.player() or not state.play(x, y, color):
+                raise ValueError(f"illegal move {(x, y)} for color {color} at turn {state.turn}")
+        return state
+
+    def copy(self) -> "GameState":
+        """Copy the state
+
+        :return: an independent copy"""
+        state = GameState.__new__(GameState)
+        state.board = self.board[:]
+        state.turn = self.turn
+        state.seats = self.seats # tuples are never modified, they can be shared
+        state.bias = self.bias
+        state.scores = self.scores[:]
+        state.history = None if self.history is None else self.history[:]
+        state.frontier = self.frontier
+        state.changed = None
+        return state
+
+    def get(self, x: int, y: int) -> int:
+        """Get the color of a cell
+
+        :param x: the x coordinate
+        :param y: the y coordinate
+        :return: the color of the cell"""
+        return self.board[y * WIDTH + x]
+
+    def to_grid(self) -> list[list[int]]:
+        """Convert the board to a nested list grid, for the functions working on grids
+
+        :return: the game grid"""
+        board = self.board
+        return [list(board[y * WIDTH:(y + 1) * WIDTH]) for y in range(HEIGHT)]
+
+    def player(self) -> int:
+        """Get the color of the player to move
+
+        :return: the color"""
+        return self.seats[(self.turn + self.bias) % len(self.seats)]
+
+    def find_frontier(self) -> int:
+        """Compute the mask of the legal cells by scanning the board, `frontier` then keeps it up to date
+
+        :return: the mask of the empty cells adjacent to a ball"""
+        board = self.board
+        frontier = 0
+        for index in range(WIDTH * HEIGHT):
+            if board[index] == CLEAR and any(board[neighbour] != CLEAR for neighbour in NEIGHBOURS[index]):
+                frontier |= 1 << index
+        return frontier
+
+    def is_legal(self, x: int, y: int) -> bool:
+        """Check if a ball can be placed at (x, y)
+
+        :param x: the x coordinate
+        :param y: the y coordinate
+        :return: True if the cell is empty and adjacent to a ball"""
+        return self.frontier >> (y * WIDTH + x) & 1 == 1
+
+    def legal_moves(self) -> set[tuple[int, int]]:
+        """Get all the cells where a ball can be placed
+
+        :return: the (x, y) coordinates of the empty cells adjacent to a ball"""
+        return set(mask_to_cells(self.frontier))
+
+    def play(self, x: int, y: int, color: int) -> bool:
+        """Play a move at (x, y) for color player, update the scores and advance the turn
+
+        :param x: the x coordinate of the move
+        :param y: the y coordinate of the move
+        :param color: the color of the player
+        :return: True if the move is valid, False otherwise"""
+        if not self.is_legal(x, y):
+            return False
+        board = self.board
+        scores = self.scores
+        changed = self.changed
+        index = y * WIDTH + x
+        for ray in FLAT_RAYS[index]:
+            run = 0
+            for cell in ray:
+                ball = board[cell]
+                if ball == CLEAR:
+                    break
+                if ball == color:
+                    # the captured balls move from their previous color to the player's
+                    for captured in ray[:run]:
+                        scores[board[captured] - 1] -= 1
+                        board[captured] = color
+                    if changed is not None:
+                        changed.update(ray[:run])
+                    scores[color - 1] += run
+                    break
+                run += 1
+        # the empty neighbours become legal, the placed cell isn't anymore
+        frontier = self.frontier & ~(1 << index)
+        for neighbour in NEIGHBOURS[index]:
+            if board[neighbour] == CLEAR and not frontier >> neighbour & 1:
+                frontier |= 1 << neighbour
+                if changed is not None:
+                    changed.add(neighbour)
+        self.frontier = frontier
+        if changed is not None:
+            changed.add(index)
+        board[index] = color
+        scores[color - 1] += 1
+        self.turn += 1
+        if self.history is not None:
+            self.history.append(encode_move(x, y, color))
+        return True
+
+    def apply(self, move: tuple[int, int]) -> bool:
+        """Play a move for the player to move
+
+        :param move: the (x, y) coordinates of the move
+        :return: True if the move is valid, False otherwise"""
+        return self.play(move[0], move[1], self.player())
+
+    def take_changes(self) -> set[tuple[int, int]]:
+        """Get the cells changed by the moves played since the last call, and forget them
+
+        They are the placed balls, the captured balls and the empty cells that became legal.
+        The first call starts tracking them and returns no cells.
+
+        :return: the (x, y) coordinates of the changed cells"""
+        if self.changed is None:
+            self.changed = set()
+            return set()
+        changed = {(index % WIDTH, index // WIDTH) for index in self.changed}
+        self.changed.clear()
+        return changed
+
+    def score(self) -> tuple[int, int, int, int]:
+        """Get the scores
+
+        :return: The scores, in the order RED, YELLOW, GREEN, BLUE"""
+        return tuple(self.scores)
+
+    def pack(self) -> bytes:
+        """Pack the state into bytes: the board as one nibble per cell, then the turn, the player bias,
+        the amount of seats and their colors, 2 bits each from the lowest bits
+
+        :return: the packed state"""
+        board = self.board
+        cells = bytes(board[i] << 4 | board[i + 1] for i in range(0, WIDTH * HEIGHT, 2))
+        seats = sum((color - 1) << (2 * i) for i, color in enumerate(self.seats))
+        return cells + bytes((self.turn, self.bias, len(self.seats), seats))
+
+    @classmethod
+    def unpack(cls, data: bytes) -> "GameState":
+        """Rebuild a state packed with `pack`
+
+        :param data: the packed state
+        :return: the game state"""
+        state = cls.__new__(cls)
+        state.board = bytearray(WIDTH * HEIGHT)
+        for i in range(WIDTH * HEIGHT // 2):
+            state.board[2 * i] = data[i] >> 4
+            state.board[2 * i + 1] = data[i] & 0b1111
+        state.turn, state.bias, nb_seats, seats = data[WIDTH * HEIGHT // 2:WIDTH * HEIGHT // 2 + 4]
+        state.seats = tuple((seats >> (2 * i) & 0b11) + 1 for i in range(nb_seats))
+        state.scores = [state.board.count(color) for color in (RED, YELLOW, GREEN, BLUE)]
+        state.history = bytearray() if state.turn == 0 else None
+        state.frontier = state.find_frontier()
+        state.changed = None
+        return state
+
+
+# bit masks used by the bitboard engine, cell (x, y) is bit y*WIDTH + x
+FULL_MASK = (1 << (WIDTH * HEIGHT)) - 1
+FIRST_COLUMN = sum(1 << (y * WIDTH) for y in range(HEIGHT))
+LAST_COLUMN = FIRST_COLUMN << (WIDTH - 1)
+# each direction as a (shift, guard) pair, the guard removes the cells that would wrap around the board
+SHIFTS = (
+    (1, FULL_MASK & ~LAST_COLUMN),                 # right
+    (-1, FULL_MASK & ~FIRST_COLUMN),               # left
+    (WIDTH, FULL_MASK),                            # down
+    (-WIDTH, FULL_MASK),                           # up
+    (WIDTH + 1, FULL_MASK & ~LAST_COLUMN),         # down right
+    (WIDTH - 1, FULL_MASK & ~FIRST_COLUMN),        # down left
+    (-WIDTH + 1, FULL_MASK & ~LAST_COLUMN),        # up right
+    (-WIDTH - 1, FULL_MASK & ~FIRST_COLUMN)        # up left
+)
+
+
+def shift(mask: int, step: int, guard: int) -> int:
+    """Move every bit of a mask by one cell in a direction
+
+    :param mask: the bit mask
+    :param step: the bit offset of the direction
+    :param guard: the cells allowed to move in that direction
+    :return: the shifted mask"""
+    mask &= guard
+    if step > 0:
+        return (mask << step) & FULL_MASK
+    return mask >> -step
+
+
+def dilate(mask: int) -> int:
+    """Get all the cells adjacent to at least one cell of a mask
+
+    :param mask: the bit mask
+    :return: the mask of the neighbouring cells"""
+    out = 0
+    for step, guard in SHIFTS:
+        out |= shift(mask, step, guard)
+    return out
+
+
+def mask_to_cells(mask: int) -> list[tuple[int, int]]:
+    """Convert a bit mask to the list of its cells
+
+    :param mask: the bit mask
+    :return: the (x, y) coordinates of the set bits"""
+    cells = []
+    while mask:
+        low = mask & -mask
+        index = low.bit_length() - 1
+        cells.append((index % WIDTH, index // WIDTH))
+        mask ^= low
+    return cells
+
+# Zobrist keys: one random 64-bit number per cell and state, plus one per color to move.
+# They are drawn from a fixed seed so keys stay the same between runs and processes.
+_zobrist_random = Random(0x5017)
+ZOBRIST = tuple(tuple(_zobrist_random.getrandbits(64) for _ in range(5)) for _ in range(WIDTH * HEIGHT))
+SIDE_KEYS = tuple(_zobrist_random.getrandbits(64) for _ in range(5))
+EMPTY_KEY = 0 # key of the empty board
+for _cell in ZOBRIST:
+    EMPTY_KEY ^= _cell[CLEAR]
+
+
+def zobrist_key(grid: list[list[int]]) -> int:
+    """Compute the Zobrist key of a grid from scratch
+
+    :param grid: the game grid
+    :return: the 64-bit key of the position, without the color to move"""
+    key = 0
+    for y in range(HEIGHT):
+        for x in range(WIDTH):
+            key ^= ZOBRIST[y * WIDTH + x][grid[y][x]]
+    return key
+
+
+def grid_masks(grid: list[list[int]]) -> list[int]:
+    """Get the bit mask of each color of a grid
+
+    :param grid: the game grid, a BitBoard returns its own masks
+    :return: the masks, indexed by color (masks[CLEAR] is unused)"""
+    if isinstance(grid, BitBoard):
+        return grid.masks
+    masks = [0, 0, 0, 0, 0]
+    for y in range(HEIGHT):
+        for x in range(WIDTH):
+            if grid[y][x] != CLEAR:
+                masks[grid[y][x]] |= 1 << (y * WIDTH + x)
+    return masks
+
+
+class BitBoard:
+    """Game grid stored as one 64-bit mask per color.
+
+    Reading `board[y][x]` works like on a nested list grid, so the existing
+    functions (`play`, `calc_score`, `saver.pack_grid`, ...) accept it too.
+    The mask of the legal placements is kept in `frontier` and the Zobrist
+    key of the position in `key`, both updated by `play`, so the masks
+    should not be modified directly."""
+    __slots__ = ("masks", "frontier", "key")
+
+    def __init__(self, masks: list[int] | None = None) -> None:
+        # masks[color] holds the cells of that color, masks[CLEAR] is unused
+        self.masks = [0, 0, 0, 0, 0] if masks is None else list(masks)
+        occupied = self.occupied()
+        self.frontier = dilate(occupied) & ~occupied
+        key = EMPTY_KEY
+        for color in (RED, YELLOW, GREEN, BLUE):
+            for x, y in mask_to_cells(self.masks[color]):
+                key ^= ZOBRIST[y * WIDTH + x][CLEAR] ^ ZOBRIST[y * WIDTH + x][color]
+        self.key = key
+
+    @classmethod
+    def from_grid(cls, grid: list[list[int]]) -> "BitBoard":
+        """Build a bitboard from a nested list grid
+
+        :param grid: the game grid
+        :return: the equivalent bitboard"""
+        return cls(grid_masks(grid))
+
+    @classmethod
+    def initial(cls) -> "BitBoard":
+        """Get the bitboard of the starting position
+
+        :return: the initialized bitboard"""
+        return cls.from_grid(init_grid())
+
+    def to_grid(self) -> list[list[int]]:
+        """Convert the bitboard back to a nested list grid
+
+        :return: the game grid"""
+        return [list(self[y]) for y in range(HEIGHT)]
+
+    def copy(self) -> "BitBoard":
+        """Copy the bitboard
+
+        :return: an independent copy"""
+        board = BitBoard.__new__(BitBoard)
+        board.masks = self.masks.copy()
+        board.frontier = self.frontier
+        board.key = self.key
+        return board
+
+    def __len__(self) -> int:
+        return HEIGHT
+
+    def __getitem__(self, y: int) -> tuple[int, ...]:
+        # read-only row, so that `board[y][x]` behaves like the nested list grid
+        return tuple(self.get(x, y) for x in range(WIDTH))
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, BitBoard) and self.masks == other.masks
+
+    def get(self, x: int, y: int) -> int:
+        """Get the color of a cell
+
+        :param x: the x coordinate
+        :param y: the y coordinate
+        :return: the color of the cell"""
+        bit = 1 << (y * WIDTH + x)
+        for color in (RED, YELLOW, GREEN, BLUE):
+            if self.masks[color] & bit:
+                return color
+        return CLEAR
+
+    def occupied(self) -> int:
+        """Get the mask of all the non-empty cells"""
+        masks = self.masks
+        return masks[RED] | masks[YELLOW] | masks[GREEN] | masks[BLUE]
+
+    def legal_mask(self) -> int:
+        """Get the mask of the empty cells adjacent to a ball"""
+        return self.frontier
+
+    def is_legal(self, x: int, y: int) -> bool:
+        """Check if a ball can be placed at (x, y)
+
+        :param x: the x coordinate
+        :param y: the y coordinate
+        :return: True if the cell is empty and adjacent to a ball"""
+        return bool(self.frontier >> (y * WIDTH + x) & 1)
+
+    def capture_mask(self, x: int, y: int, color: int) -> int:
+        """Get the balls captured by a placement at (x, y), without playing it
+
+        :param x: the x coordinate of the move
+        :param y: the y coordinate of the move
+        :param color: the color of the player
+        :return: the mask of the captured balls"""
+        bit = 1 << (y * WIDTH + x)
+        own = self.masks[color]
+        others = self.occupied() & ~own & ~bit
+        captures = 0
+        for step, guard in SHIFTS:
+            # walk over the opponent balls in this direction
+            ray = 0
+            cell = shift(bit, step, guard)
+            while cell & others:
+                ray |= cell
+                cell = shift(cell, step, guard)
+            # they are captured if the run ends on one of our balls
+            if ray and cell & own:
+                captures |= ray
+        return captures
+
+    def play(self, x: int, y: int, color: int) -> bool:
+        """Play a move at (x, y) for color player
+
+        :param x: the x coordinate of the move
+        :param y: the y coordinate of the move
+        :param color: the color of the player
+        :return: True if the move is valid, False otherwise"""
+        if not self.is_legal(x, y):
+            return False
+        index = y * WIDTH + x
+        bit = 1 << index
+        captures = self.capture_mask(x, y, color)
+        masks = self.masks
+        key = self.key ^ ZOBRIST[index][CLEAR] ^ ZOBRIST[index][color]
+        for other in (RED, YELLOW, GREEN, BLUE):
+            # update the key for every ball changing from other to color
+            captured = masks[other] & captures
+            while captured:
+                low = captured & -captured
+                cell = ZOBRIST[low.bit_length() - 1]
+                key ^= cell[other] ^ cell[color]
+                captured ^= low
+            masks[other] &= ~captures
+        masks[color] |= captures | bit
+        self.key = key
+        # captures don't change which cells are occupied, only the new ball's neighbours can join the frontier
+        self.frontier = (self.frontier | dilate(bit)) & ~self.occupied()
+        return True
+
+    def score(self) -> tuple[int, int, int, int]:
+        """Count the balls of each color
+
+        :return: The scores, in the order RED, YELLOW, GREEN, BLUE"""
+        masks = self.masks
+        return masks[RED].bit_count(), masks[YELLOW].bit_count(), masks[GREEN].bit_count(), masks[BLUE].bit_count()
+
+
+# The 8 symmetries of the board (rotations and mirrors) are numbered by the
+# operations they chain on a cell: transpose (x, y) -> (y, x) if bit 2 is set,
+# then mirror x -> 7-x if bit 0 is set, then flip y -> 7-y if bit 1 is set.
+# The mask versions use byte swaps and delta swaps, so they need an 8x8 board.
+SYMMETRIES = range(8)
+
+
+def flip_vertical(mask: int) -> int:
+    """Move the cells (x, y) of a mask to (x, 7-y), rows are the bytes of the mask"""
+    return int.from_bytes(mask.to_bytes(8, "little"), "big")
+
+
+def mirror_horizontal(mask: int) -> int:
+    """Move the cells (x, y) of a mask to (7-x, y), by reversing the bits of each byte"""
+    mask = ((mask >> 1) & 0x5555555555555555) | ((mask & 0x5555555555555555) << 1)
+    mask = ((mask >> 2) & 0x3333333333333333) | ((mask & 0x3333333333333333) << 2)
+    return ((mask >> 4) & 0x0F0F0F0F0F0F0F0F) | ((mask & 0x0F0F0F0F0F0F0F0F) << 4)
+
+
+def transpose(mask: int) -> int:
+    """Move the cells (x, y) of a mask to (y, x), by swapping the blocks across the diagonal"""
+    swap = 0x0F0F0F0F00000000 & (mask ^ (mask << 28))
+    mask ^= swap ^ (swap >> 28)
+    swap = 0x3333000033330000 & (mask ^ (mask << 14))
+    mask ^= swap ^ (swap >> 14)
+    swap = 0x5500550055005500 & (mask ^ (mask << 7))
+    return mask ^ swap ^ (swap >> 7)
+
+
+def transform_mask(mask: int, symmetry: int) -> int:
+    """Apply a symmetry to a bit mask
+
+    :param mask: the bit mask
+    :param symmetry: the symmetry, see `SYMMETRIES`
+    :return: the transformed mask"""
+    if symmetry & 4:
+        mask = transpose(mask)
+    if symmetry & 1:
+        mask = mirror_horizontal(mask)
+    if symmetry & 2:
+        mask = flip_vertical(mask)
+    return mask
+
+
+def transform_cell(x: int, y: int, symmetry: int) -> tuple[int, int]:
+    """Apply a symmetry to a cell, the way `transform_mask` does
+
+    :param x: the x coordinate
+    :param y: the y coordinate
+    :param symmetry: the symmetry, see `SYMMETRIES`
+    :return: the transformed coordinates"""
+    if symmetry & 4:
+        x, y = y, x
+    if symmetry & 1:
+        x = WIDTH - 1 - x
+    if symmetry & 2:
+        y = HEIGHT - 1 - y
+    return x, y
+
+
+def untransform_cell(x: int, y: int, symmetry: int) -> tuple[int, int]:
+    """Undo a symmetry on a cell, to map a move back from the canonical orientation
+
+    :param x: the transformed x coordinate
+    :param y: the transformed y coordinate
+    :param symmetry: the symmetry, see `SYMMETRIES`
+    :return: the original coordinates"""
+    if symmetry & 2:
+        y = HEIGHT - 1 - y
+    if symmetry & 1:
+        x = WIDTH - 1 - x
+    if symmetry & 4:
+        x, y = y, x
+    return x, y
+
+
+def canonical_form(masks: list[int], color: int, players: list[int]) -> tuple[tuple[int, ...], int]:
+    """Get the canonical form of a position, shared by its symmetric and recolored versions
+
+    The colors are renamed after the seats, starting from the color to move,
+    since only the playing order tells them apart. The starting balls of the
+    colors without a seat can be captured by anyone and never play, so they
+    are merged. The form is then the smallest of the 8 symmetric orientations
+    of the masks.
+
+    :param masks: the bit mask of each color, see `grid_masks`
+    :param color: the color to move
+    :param players: the colors in playing order
+    :return: the masks of the seats from the color to move then of the colors without a seat in the canonical orientation, and the symmetry giving it"""
+    start = players.index(color)
+    seats = [masks[players[(start + i) % len(players)]] for i in range(len(players))]
+    seats.append(sum(masks[other] for other in (RED, YELLOW, GREEN, BLUE) if other not in players))
+    best, best_symmetry = None, 0
+    for symmetry in SYMMETRIES:
+        form = tuple(transform_mask(mask, symmetry) for mask in seats)
+        if best is None or form < best:
+            best, best_symmetry = form, symmetry
+    return best, best_symmetry
+
+
+def form_key(form: tuple[int, ...]) -> int:
+    """Hash a canonical form into 64 bits, the same in every process and version
+
+    :param form: the canonical form, see `canonical_form`
+    :return: the key"""
+    key = len(form)
+    for mask in form:
+        key = ((key ^ mask) * 0x9E3779B97F4A7C15) & FULL_MASK
+        key ^= key >> 29
+    return key
+
+
+def canonical_key(grid: list[list[int]], color: int, players: list[int]) -> tuple[int, int]:
+    """Get the key of the canonical form of a position
+
+    :param grid: the game grid
+    :param color: the color to move
+    :param players: the colors in playing order
+    :return: the key, and the symmetry to apply to the moves with `transform_cell` (undone by `untransform_cell`)"""
+    form, symmetry = canonical_form(grid_masks(grid), color, players)
+    return form_key(form), symmetry
@@ -1,8 +1,29 @@
-"""Functions for saving and recalling game state"""
+"""Functions for saving and recalling game state
+
+Version 2 save files are laid out as:
+    MAGIC, VERSION, two header bytes, the scores (4 bytes per round),
+    the packed grid (32 bytes), the amount of moves (1 byte), the moves
+    (1 byte each, see `rolit.encode_move`) and the CRC32 of all the
+    previous bytes (4 bytes, big endian).
+Version 1 files are the same header bytes and scores following the packed
+grid, without magic, moves or checksum. They are still read.
+"""
+
+import os
+from zlib import crc32
+from modules.rolit import GameState, TURNS
+
+MAGIC = b"RLT" # 0x52 can't start a version 1 file, whose nibbles are colors (at most 4)
+VERSION = 2
+
+
+class SaveError(ValueError):
+    """Raised when a save file is truncated, corrupted or inconsistent"""
+
 
 def pack_grid(grid: list[list[int]]) -> bytearray:
     """Pack the grid into a bytearray
-    
+
     :param grid: the game grid"""
     out = bytearray()
     for i in range(8):
@@ -12,7 +33,7 @@ def pack_grid(grid: list[list[int]]) -> bytearray:
 
 def unpack_grid(packed: bytearray) -> list[list[int]]:
     """Unpack the grid from a bytearray
-    
+
     :param packed: the packed grid
     :return: the unpacked grid"""
     out = [[None for _ in range(8)] for _ in range(8)]
@@ -21,21 +42,19 @@ def unpack_grid(packed: bytearray) -> list[list[int]]:
         out[i//4][2*(i%4) + 1] = packed[i]  & 0b1111
     return out
 
-def save(fileName: str, grid: list[list[int]], start_bias: int, nb_players: int, nb_AIs: int, nb_rounds: int, curr_round: int, scores: list[list[int]], theme_id: int = 0) -> None:
-    """Save the game state to a file
-    
-    :param fileName: the name of the file
-    :param grid: the game grid
-    :param start_bias: the starting player
-    :param nb_players: the number of players
+def pack_header(state: GameState, nb_AIs: int, nb_rounds: int, curr_round: int, scores: list[list[int]], theme_id: int) -> bytearray:
+    """Pack the game settings and the scores, the same way in both versions
+
+    :param state: the state of the current round
     :param nb_AIs: the number of AIs
     :param nb_rounds: the number of rounds
     :param curr_round: the current round
     :param scores: the scores of the players
-    :param theme_id: the theme id"""
-    data = pack_grid(grid)
-    byte  = (start_bias << 6) & 0b11000000
-    byte |= ((nb_players-1) << 4) & 0b110000
+    :param theme_id: the theme id
+    :return: the packed header and scores"""
+    data = bytearray()
+    byte  = (state.bias << 6) & 0b11000000
+    byte |= ((len(state.seats)-nb_AIs-1) << 4) & 0b110000
     byte |= (nb_AIs << 2) & 0b1100
     byte |= (nb_rounds-1) & 0b11
     data.append(byte)
@@ -45,34 +64,110 @@ def save(fileName: str, grid: list[list[int]], start_bias: int, nb_players: int,
     for round_id in scores:
         for player in round_id:
             data.append(0xFF if player is None else player)
+    return data
+
+def unpack_header(data: bytes) -> tuple[int, int, int, int, int, int, list[list[int]], int]:
+    """Unpack the game settings and the scores
+
+    :param data: the bytes starting at the header
+    :return: the starting player, the number of players, the number of AIs, the number of rounds, the current round, the theme id, the scores, the amount of bytes read"""
+    if len(data) < 2:
+        raise SaveError("truncated header")
+    start_bias =  (data[0] >> 6) & 0b11
+    nb_players =  ((data[0] >> 4) & 0b11) + 1
+    nb_AIs =      (data[0] >> 2) & 0b11
+    nb_rounds =   ((data[0]) & 0b11) + 1
+    curr_round =  (data[1] >> 6) & 0b11
+    theme_id =    data[1] & 0b111111
+    if nb_players + nb_AIs > 4:
+        raise SaveError("too many players")
+    scores = []
+    for i in range(nb_rounds):
+        round_scores = data[2 + 4*i:6 + 4*i]
+        if len(round_scores) < 4: # scores of the rounds not played yet may be missing
+            scores.append([None] * 4)
+        else:
+            scores.append([None if score == 0xFF else score for score in round_scores])
+    return start_bias, nb_players, nb_AIs, nb_rounds, curr_round, theme_id, scores, 2 + 4*nb_rounds
+
+def save(fileName: str, state: GameState, nb_AIs: int, nb_rounds: int, curr_round: int, scores: list[list[int]], theme_id: int = 0) -> None:
+    """Save the game state to a file, in version 2
+
+    :param fileName: the name of the file
+    :param state: the state of the current round
+    :param nb_AIs: the number of AIs
+    :param nb_rounds: the number of rounds
+    :param curr_round: the current round
+    :param scores: the scores of the players
+    :param theme_id: the theme id"""
+    data = bytearray(MAGIC)
+    data.append(VERSION)
+    data += pack_header(state, nb_AIs, nb_rounds, curr_round, scores, theme_id)
+    data += pack_grid(state.to_grid())
+    # without the whole history of the round (recalled from a version 1 file), no move is saved
+    history = state.history if state.history is not None else b""
+    data.append(len(history))
+    data += history
+    data += crc32(data).to_bytes(4, "big")
     with open(fileName, "wb") as saveFile:
         saveFile.write(data)
+    from modules import catalogue # imported here since modules.catalogue depends on this module
+    catalogue.record(fileName, len(state.seats) - nb_AIs, nb_AIs, curr_round, scores)
+
+def delete(fileName: str) -> None:
+    """Delete a save file and remove it from the catalogue
+
+    :param fileName: the name of the file"""
+    os.remove(fileName)
+    from modules import catalogue # imported here since modules.catalogue depends on this module
+    catalogue.forget(fileName)
+
+def recall(fileName: str) -> tuple[GameState, int, int, int, list[list[int]], int]:
+    """Recall the game state from a file, in version 1 or 2
 
-def recall(fileName: str) -> tuple[list[list[int]], int, int, int, int, int, int]:
-    """Recall the game state from a file
-    
     :param fileName: the name of the file
-    :return: the game grid, the starting player, the number of players, the number of AIs, the number of rounds, the current round, the scores"""
-    scores = []
+    :return: the state of the current round, the number of AIs, the number of rounds, the current round, the scores, the theme id
+    :raise SaveError: if the file is truncated, corrupted or its moves don't lead to its grid"""
     with open(fileName, "rb") as saveFile:
-        grid = unpack_grid(saveFile.read(32))
-        byte1 = saveFile.read(1)[0]
-        byte2 = saveFile.read(1)[0]
-        start_bias =  (byte1 >> 6) & 0b11
-        turn = 60 - sum([grid[i].count(0) for i in range(8)])
-        nb_players =  ((byte1 >> 4) & 0b11) + 1
-        nb_AIs =      (byte1 >> 2) & 0b11
-        nb_rounds =   ((byte1) & 0b11) + 1
-        curr_round =  (byte2 >> 6) & 0b11
-        theme_id =    byte2 & 0b111111
-        for i in range(nb_rounds):
-            try:
-                round_scores = saveFile.read(4)
-                scores.append([])
-                for j in range(4):
-                    scores[i].append(None if round_scores[j] == 0xFF else round_scores[j])
-            except:
-                for j in range(nb_rounds-i):
-                    scores.append([None] * 4)
-                break
-    return grid, start_bias, turn, nb_players, nb_AIs, nb_rounds, curr_round, scores, theme_id
+        data = saveFile.read()
+    if data[:len(MAGIC)] != MAGIC:
+        return recall_v1(data)
+    if len(data) < len(MAGIC) + 5:
+        raise SaveError("truncated file")
+    if data[len(MAGIC)] != VERSION:
+        raise SaveError(f"unknown version {data[len(MAGIC)]}")
+    if crc32(data[:-4]) != int.from_bytes(data[-4:], "big"):
+        raise SaveError("checksum mismatch")
+    body = data[len(MAGIC) + 1:-4]
+    start_bias, nb_players, nb_AIs, nb_rounds, curr_round, theme_id, scores, offset = unpack_header(body)
+    packed = body[offset:offset + 32]
+    if len(packed) < 32 or len(body) < offset + 33:
+        raise SaveError("truncated grid")
+    grid = unpack_grid(packed)
+    history = body[offset + 33:offset + 33 + body[offset + 32]]
+    if len(history) != body[offset + 32]:
+        raise SaveError("truncated moves")
+    seats = TURNS[nb_players + nb_AIs]
+    if not history:
+        return GameState(grid, seats, start_bias), nb_AIs, nb_rounds, curr_round, scores, theme_id
+    # replay the moves to check that they are legal and lead to the saved grid
+    try:
+        state = GameState.replay(history, seats, start_bias)
+    except ValueError as error:
+        raise SaveError(str(error)) from error
+    if state.to_grid() != grid:
+        raise SaveError("the moves don't lead to the saved grid")
+    return state, nb_AIs, nb_rounds, curr_round, scores, theme_id
+
+def recall_v1(data: bytes) -> tuple[GameState, int, int, int, list[list[int]], int]:
+    """Recall the game state from the content of a version 1 file
+
+    :param data: the content of the file
+    :return: see `recall`"""
+    if len(data) < 32:
+        raise SaveError("truncated grid")
+    grid = unpack_grid(data[:32])
+    start_bias, nb_players, nb_AIs, nb_rounds, curr_round, theme_id, scores, _ = unpack_header(data[32:])
+    # the turn is deduced from the amount of balls on the grid
+    state = GameState(grid, TURNS[nb_players + nb_AIs], start_bias)
+    return state, nb_AIs, nb_rounds, curr_round, scores, theme_id
@@ -0,0 +1,156 @@
+"""Headless self-play, to evaluate the AIs on many games"""
+
+import json
+import random
+from time import perf_counter
+from modules.rolit import *
+from modules.archive import append_games, write_index
+
+AI_NAMES = ("greedy", "random", "alphabeta", "maxn", "mcts")
+
+
+def play_round(nb_players: int, strategies: list[str], player_bias: int, options: dict | None = None) -> tuple[tuple[int, int, int, int], list[tuple[int, int, int]]]:
+    """Play a full round between AIs
+
+    :param nb_players: the number of players
+    :param strategies: the AI of each seat, in the order of `TURNS[nb_players]`
+    :param player_bias: the index of the seat playing first
+    :param options: settings of each AI, by AI name (time_budget, depth, ...)
+    :return: the final scores (RED, YELLOW, GREEN, BLUE) and the moves played as (x, y, color)"""
+    options = {} if options is None else options
+    seats = TURNS[nb_players]
+    state = GameState(None, seats, player_bias)
+    moves = []
+    while state.turn < WIDTH * HEIGHT - 4:
+        seat = (state.turn + player_bias) % nb_players
+        color = seats[seat]
+        x, y = ai_move(state.to_grid(), color, strategies[seat], seats, **options.get(strategies[seat], {}))
+        state.play(x, y, color)
+        moves.append((x, y, color))
+    return state.score(), moves
+
+
+def round_winners(scores: tuple[int, int, int, int], nb_players: int) -> list[int]:
+    """Get the colors having the best score of a round
+
+    :param scores: the scores, in the order RED, YELLOW, GREEN, BLUE
+    :param nb_players: the number of players
+    :return: the winning colors, several in case of equality"""
+    seats = TURNS[nb_players]
+    best = max(scores[color - 1] for color in seats)
+    return [color for color in seats if scores[color - 1] == best]
+
+
+def play_game(nb_players: int, strategies: list[str], nb_rounds: int = 1, options: dict | None = None) -> dict:
+    """Play a full game of several rounds between AIs
+
+    :param nb_players: the number of players
+    :param strategies: the AI of each seat, in the order of `TURNS[nb_players]`
+    :param nb_rounds: the number of rounds
+    :param options: settings of each AI, by AI name
+    :return: the game record: seats, AIs and, for each round, the player bias, moves, scores and winners"""
+    seats = TURNS[nb_players]
+    rounds_won = {color: 0 for color in seats}
+    rounds = []
+    for _ in range(nb_rounds):
+        player_bias = random.randint(0, nb_players - 1)
+        scores, moves = play_round(nb_players, strategies, player_bias, options)
+        winners = round_winners(scores, nb_players)
+        for color in winners:
+            rounds_won[color] += 1
+        rounds.append({"bias": player_bias, "moves": moves, "scores": scores, "winners": winners})
+    most = max(rounds_won.values())
+    return {
+        "seats": seats,
+        "ai": list(strategies),
+        "rounds": rounds,
+        "winners": [color for color in seats if rounds_won[color] == most]
+    }
+
+
+def simulate(nb_games: int, nb_players: int, strategies: list[str], nb_rounds: int = 1, output: str | None = "simulation.jsonl", options: dict | None = None, seed: int | None = None, archive: str | None = None) -> dict:
+    """Play many games and write one JSON record per game
+
+    :param nb_games: the number of games
+    :param nb_players: the number of players
+    :param strategies: the AI of each seat, repeated if there are fewer than players
+    :param nb_rounds: the number of rounds per game
+    :param output: the file to write the results to, None to not write them
+    :param options: settings of each AI, by AI name
+    :param seed: the random seed, for reproducible runs
+    :param archive: a game archive to append the games to, indexed at the end, see `modules.archive`
+    :return: aggregate statistics: games, seconds, games per second and games won by each AI"""
+    if seed is not None:
+        random.seed(seed)
+    strategies = [strategies[i % len(strategies)] for i in range(nb_players)]
+    wins = {name: 0.0 for name in strategies}
+    start = perf_counter()
+    out_file = None if output is None else open(output, "w")
+    try:
+        for game_id in range(nb_games):
+            record = play_game(nb_players, strategies, nb_rounds, options)
+            # a shared victory is split between the winners
+            for color in record["winners"]:
+                wins[strategies[TURNS[nb_players].index(color)]] += 1 / len(record["winners"])
+            if archive is not None:
+                append_games(archive, [record])
+            if out_file is not None:
+                record["game"] = game_id
+                out_file.write(json.dumps(record) + "\n")
+    finally:
+        if out_file is not None:
+            out_file.close()
+    if archive is not None:
+        write_index(archive) # the next readers find the games without scanning the file
+    elapsed = perf_counter() - start
+    return {
+        "games": nb_games,
+        "seconds": elapsed,
+        "games_per_second": nb_games / elapsed if elapsed else 0.0,
+        "wins": wins
+    }
+
+
+def ai_options(args) -> dict:
+    """Build the settings of each AI from the command line arguments of simulate and tournament
+
+    :param args: the parsed command line arguments
+    :return: the settings of each AI, by AI name"""
+    # the book and the endgame solver are off unless asked for: the solver has a wall-clock budget, so runs with a seed wouldn't repeat
+    options = {name: {"book": args.book} for name in AI_NAMES}
+    if args.endgame is not None:
+        for name in AI_NAMES:
+            options[name]["endgame"] = ENDGAME_EMPTIES if args.endgame else 0
+    # the search AIs share the time budget, the depth only applies to alpha-beta and max-n
+    for name in ("alphabeta", "maxn", "mcts"):
+        options[name]["time_budget"] = args.time
+    if args.depth:
+        options["alphabeta"]["depth"] = options["maxn"]["depth"] = args.depth
+    return options
+
+
+def main(args) -> None:
+    """Entry point of `python main.py simulate`
+
+    :param args: the parsed command line arguments"""
+    strategies = args.strategies.split(",")
+    for name in strategies:
+        if name not in AI_NAMES:
+            print(f"IA inconnue : {name} (choix possibles : {', '.join(AI_NAMES)})")
+            return
+    options = ai_options(args)
+    import modules.ai as ai # imported here since the search AIs are only loaded when needed
+    if args.table_bits:
+        ai.TABLE_BITS = args.table_bits
+    stats = simulate(args.games, args.players, strategies, args.rounds, args.output, options, args.seed, args.archive)
+    print(f"{stats['games']} parties en {stats['seconds']:.2f} s ({stats['games_per_second']:.2f} parties/s)")
+    for name, won in stats["wins"].items():
+        print(f"{name} : {won:g} victoires")
+    if "mcts" in strategies:
+        from modules.mcts import TREES # the trees of this process, kept between the moves
+        playouts = sum(tree.playouts for tree in TREES.values())
+        elapsed = sum(tree.elapsed for tree in TREES.values())
+        print(f"mcts : {playouts / elapsed if elapsed else 0:.0f} simulations/s")
+    if ai.TABLES: # the tables of alphabeta and of the endgame solver in this process, kept between the moves
+        hit_rate, usage = ai.table_stats()
+        print(f"tables de transposition (2^{ai.TABLE_BITS} entrées) : {hit_rate:.1%} de positions retrouvées, {usage:.1%} remplies")
@@ -0,0 +1,182 @@
+"""Round-robin tournaments between AIs, spread over several processes"""
+
+import json
+import random
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from itertools import combinations
+from math import log10
+from time import perf_counter
+from modules.rolit import *
+from modules.simulate import AI_NAMES, ai_options, play_round, round_winners
+
+BASE_RATING = 1500 # average rating of the AIs
+BOOTSTRAP_SAMPLES = 200 # resamplings used for the confidence intervals
+FIT_ITERATIONS = 100 # iterations of the rating fit, for the estimate and every resampling
+
+
+def schedule(strategies: list[str], nb_players: int, games: int) -> list[tuple[int, tuple[str, ...], int]]:
+    """Build the list of games of a round-robin tournament
+
+    Every group of nb_players AIs plays `games` games per seat rotation,
+    and the starting player (player bias) rotates between those games.
+
+    :param strategies: the names of the AIs
+    :param nb_players: the number of players per game
+    :param games: the number of games per group and seat rotation
+    :return: the games as (game id, AI of each seat, player bias)"""
+    # with fewer AIs than seats, some AIs play several seats
+    names = [strategies[i % len(strategies)] for i in range(max(len(strategies), nb_players))]
+    groups = sorted(set(combinations(names, nb_players)))
+    jobs = []
+    for group in groups:
+        for rotation in range(nb_players):
+            lineup = group[rotation:] + group[:rotation]
+            for game in range(games):
+                jobs.append((len(jobs), lineup, game % nb_players))
+    return jobs
+
+
+def play_match(game_id: int, lineup: tuple[str, ...], player_bias: int, nb_rounds: int, options: dict, seed: int) -> dict:
+    """Play one tournament game (in a worker process)
+
+    :param game_id: the id of the game
+    :param lineup: the AI of each seat, in the order of `TURNS[nb_players]`
+    :param player_bias: the seat playing first in the first round
+    :param nb_rounds: the number of rounds
+    :param options: settings of each AI, by AI name
+    :param seed: the random seed of the game
+    :return: the game result: id, AIs, player bias, scores and rounds won of each seat"""
+    random.seed(seed)
+    nb_players = len(lineup)
+    seats = TURNS[nb_players]
+    rounds_won = [0] * nb_players
+    scores = []
+    for round_i in range(nb_rounds):
+        # the first player keeps rotating between rounds
+        round_scores, _ = play_round(nb_players, list(lineup), (player_bias + round_i) % nb_players, options)
+        for color in round_winners(round_scores, nb_players):
+            rounds_won[seats.index(color)] += 1
+        scores.append([round_scores[color - 1] for color in seats])
+    return {"game": game_id, "ai": list(lineup), "bias": player_bias, "scores": scores, "rounds_won": rounds_won}
+
+
+def run_tournament(strategies: list[str], nb_players: int = 2, games: int = 10, nb_rounds: int = 1, options: dict | None = None, workers: int | None = None, seed: int | None = None):
+    """Play a tournament on a process pool, yielding each game result as soon as it is finished
+
+    :param strategies: the names of the AIs
+    :param nb_players: the number of players per game
+    :param games: the number of games per group and seat rotation
+    :param nb_rounds: the number of rounds per game
+    :param options: settings of each AI, by AI name
+    :param workers: the number of processes, defaults to the number of cores
+    :param seed: the random seed, for reproducible games
+    :return: a generator of game results, see `play_match`"""
+    rng = random.Random(seed)
+    options = {} if options is None else options
+    with ProcessPoolExecutor(workers) as pool:
+        futures = [
+            pool.submit(play_match, game_id, lineup, player_bias, nb_rounds, options, rng.getrandbits(32))
+            for game_id, lineup, player_bias in schedule(strategies, nb_players, games)
+        ]
+        for future in as_completed(futures):
+            yield future.result()
+
+
+def pairwise(results: list[dict]) -> list[tuple[str, str, float]]:
+    """Split game results into duels between AIs
+
+    Two seats with different AIs are compared on their rounds won.
+
+    :param results: the game results
+    :return: the duels as (AI, opponent, score of the AI: 1, 0.5 or 0)"""
+    duels = []
+    for result in results:
+        for i, j in combinations(range(len(result["ai"])), 2):
+            if result["ai"][i] == result["ai"][j]:
+                continue
+            difference = result["rounds_won"][i] - result["rounds_won"][j]
+            duels.append((result["ai"][i], result["ai"][j], 1.0 if difference > 0 else 0.5 if difference == 0 else 0.0))
+    return duels
+
+
+def fit_ratings(names: list[str], duels: list[tuple[str, str, float]], iterations: int = FIT_ITERATIONS) -> dict[str, float]:
+    """Fit Elo ratings to duel results (Bradley-Terry model)
+
+    Every pair of AIs gets half a virtual drawn duel, so that an AI winning
+    or losing every duel still gets a finite rating.
+
+    :param names: the names of the AIs
+    :param duels: the duels, see `pairwise`
+    :param iterations: the number of fitting iterations
+    :return: the rating of each AI"""
+    wins = {name: 0.0 for name in names}
+    played = {(a, b): 0.0 for a in names for b in names if a != b}
+    for a, b in played: # (a, b) and (b, a) are both in played
+        wins[a] += 0.25
+        played[(a, b)] += 0.5
+    for a, b, score in duels:
+        wins[a] += score
+        wins[b] += 1 - score
+        played[(a, b)] += 1
+        played[(b, a)] += 1
+    strength = {name: 1.0 for name in names}
+    for _ in range(iterations):
+        strength = {
+            a: wins[a] / sum(played[(a, b)] / (strength[a] + strength[b]) for b in names if b != a)
+            for a in names
+        }
+    ratings = {name: 400 * log10(strength[name]) for name in names}
+    average = sum(ratings.values()) / len(ratings)
+    return {name: BASE_RATING + rating - average for name, rating in ratings.items()}
+
+
+def ratings(results: list[dict], samples: int = BOOTSTRAP_SAMPLES, seed: int | None = None, iterations: int = FIT_ITERATIONS) -> dict[str, tuple[float, float, float]]:
+    """Compute the Elo rating of each AI with a 95% confidence interval
+
+    The interval comes from fitting the ratings again on resampled games,
+    with as many iterations as the estimate so that both converge alike.
+
+    :param results: the game results
+    :param samples: the number of resamplings
+    :param seed: the random seed of the resampling
+    :param iterations: the number of fitting iterations of each fit
+    :return: the rating, lower bound and upper bound of each AI"""
+    names = sorted({name for result in results for name in result["ai"]})
+    if len(names) < 2:
+        return {name: (BASE_RATING, BASE_RATING, BASE_RATING) for name in names}
+    rng = random.Random(seed)
+    estimate = fit_ratings(names, pairwise(results), iterations)
+    resampled = {name: [] for name in names}
+    for _ in range(samples):
+        sample = [results[rng.randrange(len(results))] for _ in results]
+        for name, rating in fit_ratings(names, pairwise(sample), iterations).items():
+            resampled[name].append(rating)
+    out = {}
+    for name in names:
+        values = sorted(resampled[name])
+        out[name] = (estimate[name], values[int(0.025 * (samples - 1))], values[int(0.975 * (samples - 1))])
+    return out
+
+
+def main(args) -> None:
+    """Entry point of `python main.py tournament`
+
+    :param args: the parsed command line arguments"""
+    strategies = args.strategies.split(",")
+    for name in strategies:
+        if name not in AI_NAMES:
+            print(f"IA inconnue : {name} (choix possibles : {', '.join(AI_NAMES)})")
+            return
+    options = ai_options(args)
+    results = []
+    start = perf_counter()
+    with open(args.output, "w") as out_file:
+        for result in run_tournament(strategies, args.players, args.games, args.rounds, options, args.workers, args.seed):
+            results.append(result)
+            out_file.write(json.dumps(result) + "\n")
+            out_file.flush() # results are streamed, the file can be followed while the tournament runs
+            print(f"\r{len(results)} parties jouées", end="", flush=True)
+    elapsed = perf_counter() - start
+    print(f"\n{len(results)} parties en {elapsed:.2f} s ({len(results) / elapsed:.2f} parties/s)")
+    for name, (rating, low, high) in sorted(ratings(results, seed=args.seed).items(), key=lambda item: -item[1][0]):
+        print(f"{name:>10} : {rating:7.1f} Elo  [{low:7.1f} ; {high:7.1f}]")